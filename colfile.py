@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""列式二进制文件（.col）
+
+同一份导出数据需要反复统计时，每次都要重新解析 JSON/CSV 文本。
+.col 文件按列存储，读取时用 mmap 映射，数值列直接得到 memoryview，不需要解析文本。
+
+文件结构（小端序）：
+
+    MAGIC (8 字节) | 表头位置 (uint64) | 表头长度 (uint64) | 各列数据 ... | 表头 JSON
+
+表头 JSON 记录行数和每一列的名称、存储方式、空值个数（null_count）、各数据段的位置 [offset, length]。
+各数据段按 8 字节对齐。列的存储方式：
+
+- int：int64 数组（values）+ 空值位图（nulls，每行 1 位，1 表示空值）
+- float：float64 数组 + 空值位图
+- bool：每行 1 字节（0/1）+ 空值位图
+- dict：字典编码，uint32 编号数组（0 表示空值，i 表示字典中第 i 个值）
+  + 字典（dict，不同值组成的 JSON 数组）；字符串、日期等都用这种方式存储
+
+写入时逐行追加，各列先写入临时文件，内存只与字典大小有关。
+数值列中出现不符合类型的值（如整数列中的文字）时，该列自动改为 dict 存储。
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b"COLFILE1"
+_POINTER = struct.Struct("<QQ")
+_ALIGN = 8
+
+# 存储方式 -> array 类型码
+TYPECODES = {"int": "q", "float": "d", "bool": "B", "dict": "I"}
+
+# 每列缓存多少个值后写入临时文件
+_FLUSH_EVERY = 1 << 16
+
+_SWAP = sys.byteorder != "little"
+
+
+def is_colfile(path):
+    """文件是否以 .col 文件的 MAGIC 开头。"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _fits(kind, value):
+    """值能否按数值列的方式存储。"""
+    if kind == "int":
+        return type(value) is int and -(1 << 63) <= value < (1 << 63)
+    if kind == "float":
+        # 超出 float64 范围的整数转换时会 OverflowError
+        return type(value) is float or (type(value) is int and abs(value) <= sys.float_info.max)
+    return type(value) is bool
+
+
+class _ColumnBuilder:
+    """写入时的一列：值先缓存在 array 中，满了写入临时文件。"""
+
+    def __init__(self, name, kind):
+        if kind not in TYPECODES:
+            raise ValueError(f"未知的列存储方式：{kind}")
+        self.name = name
+        self.kind = kind
+        self.rows = 0
+        self.null_count = 0
+        self.nulls = bytearray()
+        self.spill = tempfile.TemporaryFile()
+        self.buffer = array(TYPECODES[kind])
+        # dict 列：字符串直接作为键，其他值用 (类型, 值) 作为键，避免 1、1.0、True 被当作同一个值
+        self.lookup = {}
+        self.dictionary = []
+
+    def _code(self, value):
+        key = value if type(value) is str else (type(value), value)
+        code = self.lookup.get(key)
+        if code is None:
+            self.dictionary.append(value)
+            code = self.lookup[key] = len(self.dictionary)
+        return code
+
+    def append(self, value):
+        row = self.rows
+        self.rows += 1
+        if row % 8 == 0:
+            self.nulls.append(0)
+
+        if self.kind == "dict":
+            if value is None:
+                self.null_count += 1
+                self.buffer.append(0)
+            else:
+                self.buffer.append(self._code(value))
+        elif value is None:
+            self.null_count += 1
+            self.nulls[row >> 3] |= 1 << (row & 7)
+            self.buffer.append(0)
+        elif _fits(self.kind, value):
+            self.buffer.append(value)
+        else:
+            self._to_dict()
+            self.buffer.append(self._code(value))
+
+        if len(self.buffer) >= _FLUSH_EVERY:
+            self._flush()
+
+    def _flush(self):
+        if _SWAP:
+            self.buffer.byteswap()
+        self.buffer.tofile(self.spill)
+        del self.buffer[:]
+
+    def _is_null(self, row):
+        return self.nulls[row >> 3] >> (row & 7) & 1
+
+    def _to_dict(self):
+        """数值列改为 dict 存储：把已写入的值重新编码。"""
+        self._flush()
+        old = array(TYPECODES[self.kind])
+        self.spill.seek(0)
+        old.fromfile(self.spill, self.rows - 1)
+        if _SWAP:
+            old.byteswap()
+        self.spill.close()
+
+        as_value = bool if self.kind == "bool" else (lambda v: v)
+        self.kind = "dict"
+        self.spill = tempfile.TemporaryFile()
+        self.buffer = array("I")
+        for row, value in enumerate(old):
+            self.buffer.append(0 if self._is_null(row) else self._code(as_value(value)))
+            if len(self.buffer) >= _FLUSH_EVERY:
+                self._flush()
+
+    def sections(self):
+        """产出 (段名, 数据)，数据为 bytes 或已写好的临时文件。"""
+        self._flush()
+        yield "values", self.spill
+        if self.kind == "dict":
+            text = json.dumps(self.dictionary, ensure_ascii=False, default=str)
+            yield "dict", text.encode("utf-8")
+        else:
+            yield "nulls", bytes(self.nulls)
+
+
+class ColumnFileWriter:
+    """逐行写入 .col 文件。
+
+    kinds 为每一列的存储方式（int/float/bool/dict），省略时都用 dict。
+    出错时调用 abort() 删除不完整的文件；也可以用 with 语句。
+    """
+
+    def __init__(self, path, names, kinds=None):
+        self.path = path
+        self.names = list(names)
+        kinds = kinds or ["dict"] * len(self.names)
+        if len(kinds) != len(self.names):
+            raise ValueError("列类型的数量与列数不一致")
+        self.columns = [_ColumnBuilder(n, k) for n, k in zip(self.names, kinds)]
+        self.rows = 0
+        self._width = len(self.names)
+        self.f = open(path, "wb")
+
+    def write(self, row):
+        """追加一行（值的列表，按列顺序）；列数不足时按空值处理。"""
+        if len(row) < self._width:
+            row = list(row) + [None] * (self._width - len(row))
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        self.rows += 1
+
+    def _pad(self):
+        padding = -self.f.tell() % _ALIGN
+        if padding:
+            self.f.write(b"\0" * padding)
+
+    def close(self):
+        """写入各列数据和表头。"""
+        f = self.f
+        f.write(MAGIC)
+        f.write(_POINTER.pack(0, 0))
+        meta = []
+        for column in self.columns:
+            info = {"name": column.name, "kind": column.kind, "null_count": column.null_count}
+            for name, data in column.sections():
+                self._pad()
+                start = f.tell()
+                if isinstance(data, bytes):
+                    f.write(data)
+                else:
+                    data.seek(0)
+                    while True:
+                        block = data.read(1 << 20)
+                        if not block:
+                            break
+                        f.write(block)
+                    data.close()
+                info[name] = [start, f.tell() - start]
+            meta.append(info)
+
+        header = json.dumps(
+            {"version": 1, "rows": self.rows, "columns": meta}, ensure_ascii=False
+        ).encode("utf-8")
+        self._pad()
+        offset = f.tell()
+        f.write(header)
+        f.seek(len(MAGIC))
+        f.write(_POINTER.pack(offset, len(header)))
+        f.close()
+
+    def abort(self):
+        """放弃写入，删除文件。"""
+        for column in self.columns:
+            column.spill.close()
+        self.f.close()
+        os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ColumnView:
+    """只读的一列。
+
+    - values：数值列为 int64/float64/uint8 的 memoryview（空值位置为 0），dict 列为编号
+    - dictionary：dict 列的值列表，dictionary[0] 为 None（空值）
+    - 迭代时产出 Python 值，空值为 None
+    """
+
+    def __init__(self, name, kind, rows, null_count, values, nulls=None, dictionary=None):
+        self.name = name
+        self.kind = kind
+        self.rows = rows
+        self.null_count = null_count
+        self.values = values
+        self.nulls = nulls
+        self.dictionary = dictionary
+
+    def __len__(self):
+        return self.rows
+
+    def is_null(self, i):
+        if self.kind == "dict":
+            return self.values[i] == 0
+        return bool(self.nulls[i >> 3] >> (i & 7) & 1)
+
+    def __getitem__(self, i):
+        if self.kind == "dict":
+            return self.dictionary[self.values[i]]
+        if self.null_count and self.is_null(i):
+            return None
+        value = self.values[i]
+        return bool(value) if self.kind == "bool" else value
+
+    def __iter__(self):
+        if self.kind == "dict":
+            return map(self.dictionary.__getitem__, self.values)
+        if not self.null_count:
+            return map(bool, self.values) if self.kind == "bool" else iter(self.values)
+        return self._iter_with_nulls()
+
+    def _iter_with_nulls(self):
+        values = self.values
+        nulls = self.nulls
+        as_bool = self.kind == "bool"
+        for i in range(self.rows):
+            if nulls[i >> 3] >> (i & 7) & 1:
+                yield None
+            else:
+                yield bool(values[i]) if as_bool else values[i]
+
+
+class ColumnFile:
+    """用 mmap 读取 .col 文件。关闭前不能再使用取出的列。"""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件不能映射
+            self._f.close()
+            raise ValueError("不是有效的 .col 文件") from None
+        self._views = []
+        try:
+            if self._mm[:len(MAGIC)] != MAGIC:
+                raise ValueError("不是有效的 .col 文件")
+            offset, length = _POINTER.unpack_from(self._mm, len(MAGIC))
+            if not offset:
+                raise ValueError(".col 文件不完整（写入时被中断）")
+            header = json.loads(self._mm[offset:offset + length].decode("utf-8"))
+        except BaseException:
+            self.close()
+            raise
+        self.rows = header["rows"]
+        self._meta = {c["name"]: c for c in header["columns"]}
+        self.names = [c["name"] for c in header["columns"]]
+        self._cache = {}
+
+    def _section(self, section, typecode=None):
+        offset, length = section
+        if typecode is None:
+            return self._mm[offset:offset + length]
+        if _SWAP:
+            data = array(typecode, self._mm[offset:offset + length])
+            data.byteswap()
+            return memoryview(data)
+        base = memoryview(self._mm)[offset:offset + length]
+        view = base.cast(typecode)
+        self._views += [base, view]
+        return view
+
+    def kind(self, name):
+        return self._meta[name]["kind"]
+
+    def column(self, name):
+        """取出一列；列名不存在时抛出 ValueError。"""
+        view = self._cache.get(name)
+        if view is not None:
+            return view
+        meta = self._meta.get(name)
+        if meta is None:
+            raise ValueError(f"字段不存在：{name}")
+        kind = meta["kind"]
+        values = self._section(meta["values"], TYPECODES[kind])
+        if kind == "dict":
+            dictionary = [None] + json.loads(self._section(meta["dict"]).decode("utf-8"))
+            view = ColumnView(name, kind, self.rows, meta["null_count"], values, dictionary=dictionary)
+        else:
+            nulls = self._section(meta["nulls"])
+            view = ColumnView(name, kind, self.rows, meta["null_count"], values, nulls=nulls)
+        self._cache[name] = view
+        return view
+
+    def iter_rows(self, names=None):
+        """逐行产出指定列（默认全部列）的值组成的元组。"""
+        columns = [self.column(n) for n in (self.names if names is None else names)]
+        return zip(*columns)
+
+    def iter_dicts(self, names=None):
+        """逐行产出 {列名: 值}。"""
+        names = self.names if names is None else list(names)
+        for row in self.iter_rows(names):
+            yield dict(zip(names, row))
+
+    def first_dict(self):
+        """第一行（没有数据时为 None），用于显示字段名。"""
+        return next(self.iter_dicts(), None)
+
+    def close(self):
+        # 先释放 memoryview，否则 mmap 无法关闭
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._cache = {}
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -10,6 +10,14 @@ Python3 + Tkinter tool to convert Excel (first sheet only) or CSV into JSON.
 规则：
 - 只读取第一个工作表（对于 Excel），或整个 CSV 文件。
 - 第一行为字段名，从第二行起为数据。
+- 转换时逐行读取、逐条写入 JSON，内存占用与行数无关。
+- 预览只读取前 20 行，与文件大小无关。
+- 输出格式：JSON 数组或 JSON Lines（每行一条记录），可选紧凑格式（不缩进，写入更快）；
+  或列式二进制文件 .col（见 colfile.py），json_counter / json_total 可以直接读取，反复统计时不需要解析文本。
+- 自动识别类型：根据前 1000 行推断每一列的类型（整数、小数、布尔、日期、空值），
+  输出 JSON 中的数字/布尔/null，而不是全部为字符串（见 type_infer.py）。
+- 批量转换：输入目录或通配符（如 D:/data/*.xlsx），转换每个文件的每一个工作表，
+  每个工作表输出一个文件（Excel 为 “文件名-工作表名.json”），多个文件在进程池中并行转换。
 
 第三方库策略：
 - 优先使用标准库，CSV 通过内置 csv 模块解析，不需要任何第三方库。
@@ -20,12 +28,40 @@ Python3 + Tkinter tool to convert Excel (first sheet only) or CSV into JSON.
 运行: python3 convert-excel.py
 """
 
-import csv
+import glob
+import itertools
 import json
+import multiprocessing
 import os
+import re
+import time
 import tkinter as tk
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from tkinter import ttk, filedialog, messagebox
 
+import csv_join
+from colfile import ColumnFileWriter
+from json_stream import JsonArrayWriter, JsonLinesWriter
+from tk_jobs import JobRunner
+from type_infer import typed_rows
+
+# 每读取多少行报告一次进度
+PROGRESS_EVERY = 10000
+
+# 预览显示的记录数
+PREVIEW_ROWS = 20
+
+EXCEL_EXTS = {".xls", ".xlsx", ".xlsm", ".xltx", ".xltm"}
+
+# 输出格式 -> 扩展名
+OUTPUT_EXTS = {"json": ".json", "jsonl": ".jsonl", "col": ".col"}
+
+# 推断的列类型 -> .col 文件中的存储方式（其他类型用字典编码）
+COL_KINDS = {"int": "int", "float": "float", "bool": "bool"}
+
+# 批量转换时至少每隔多少秒报告一次进度（进度回调中检查是否取消）
+BATCH_POLL_SECONDS = 0.5
+
 # openpyxl 相关：延迟/可选导入
 try:
     from openpyxl import load_workbook  # type: ignore
@@ -35,15 +71,419 @@ except Exception:
     _HAS_OPENPYXL = False
 
 
+# ----------------- 数据读取 -----------------
+# 模块级函数：批量转换时在子进程中调用
+
+def _require_openpyxl():
+    if not _HAS_OPENPYXL:
+        raise RuntimeError("解析 Excel 文件需要 openpyxl，请先执行: pip install openpyxl/sudo apt install python3-openpyxl")
+
+
+def _iter_csv_rows(path):
+    """逐行读取 CSV：先产出 (表头, None)，再产出每一行（跳过整行为空的行）。"""
+    rows = csv_join.iter_csv_rows(path)
+    headers = next(rows, None)
+    if not headers:
+        raise ValueError("CSV 文件为空或没有表头")
+    yield [str(h).strip() if h is not None else "" for h in headers], None
+    width = len(headers)
+    for row in rows:
+        if all(cell == "" for cell in row):
+            # 整行为空
+            continue
+        if len(row) < width:
+            row = row + [""] * (width - len(row))
+        yield row
+
+
+def _iter_sheet_rows(sheet):
+    """逐行读取一个工作表：先产出 (表头, 总行数)，再产出每一行的值（跳过整行为空的行）。
+
+    使用 iter_rows(values_only=True)，不把整个 sheet 读入内存。
+    """
+    rows = sheet.iter_rows(values_only=True)
+    first = next(rows, None)
+    if first is None:
+        raise ValueError(f"工作表 {sheet.title} 没有数据")
+
+    # 第一行字段名；max_row 来自文件中记录的表格范围，可能不准确或缺失
+    headers = [str(v).strip() if v is not None else "" for v in first]
+    total = sheet.max_row - 1 if sheet.max_row else None
+    yield headers, total
+
+    width = len(headers)
+    for values in rows:
+        # 如果整行为空，则跳过
+        if all(v is None for v in values):
+            continue
+        values = list(values)
+        if len(values) < width:
+            values += [None] * (width - len(values))
+        yield values
+
+
+def _iter_excel_rows(path):
+    """逐行读取第一个 sheet（read_only 模式），格式同 _iter_sheet_rows。需要 openpyxl。"""
+    _require_openpyxl()
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from _iter_sheet_rows(wb.worksheets[0])  # 第一个 sheet
+    finally:
+        wb.close()
+
+
+def _select_columns(rows, infer_types=False):
+    """处理 (表头, 总行数) 之后的行：忽略空字段名的列，可选推断列类型。
+
+    先产出 (字段名, 总行数, 列类型)，再产出每一行保留列的值；不推断类型时列类型为 None。
+    """
+    headers, total = next(rows)
+    if not any(headers):
+        rows.close()
+        raise ValueError("第一行没有有效的字段名")
+
+    # 忽略空字段名的列
+    source = rows
+    keep = [i for i, h in enumerate(headers) if h]
+    if len(keep) != len(headers):
+        rows = ([row[i] for i in keep] for row in rows)
+    types = None
+    if infer_types:
+        types, rows = typed_rows(rows, len(keep))
+    try:
+        yield [headers[i] for i in keep], total, types
+        yield from rows
+    finally:
+        # 提前结束（如预览只读前几行）时立即关闭文件/工作簿
+        source.close()
+
+
+def _limit_records(records, limit):
+    """只产出表头信息和前 limit 行，然后关闭 records，不再读取剩余部分。"""
+    try:
+        yield next(records)
+        yield from itertools.islice(records, limit)
+    finally:
+        records.close()
+
+
+def iter_records(path, infer_types=False, limit=None):
+    """按文件类型逐行读取：先产出 (字段名, 总行数, 列类型)，再产出每一行保留列的值。
+
+    空字段名的列被忽略；总行数未知时为 None。
+    infer_types 为 True 时根据前几行推断列类型并逐行转换值，否则列类型为 None。
+    limit 不为 None 时最多读取 limit 行（类型仍按推断样本推断，与完整转换一致）。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        rows = _iter_csv_rows(path)
+    elif ext in EXCEL_EXTS:
+        rows = _iter_excel_rows(path)
+    else:
+        raise ValueError("不支持的文件类型，请选择 CSV 或 Excel 文件")
+    records = _select_columns(rows, infer_types)
+    if limit is not None:
+        records = _limit_records(records, limit)
+    return records
+
+
+def write_records(headers, records, save_path, output_format="json", compact=False, progress=None, types=None):
+    """把记录逐条写入 JSON / JSON Lines / .col 文件，返回记录数。
+
+    没有记录时抛出 ValueError 且不创建文件；出错或取消时删除不完整的文件。
+    progress(count) 每写入 PROGRESS_EVERY 条调用一次。
+    types 为推断的列类型，用于选择 .col 文件中每一列的存储方式。
+    """
+    first = next(records, None)
+    if first is None:
+        raise ValueError("没有可导出的数据")
+
+    count = 0
+
+    def pump(write):
+        nonlocal count
+        for row in itertools.chain([first], records):
+            write(row)
+            count += 1
+            if progress and count % PROGRESS_EVERY == 0:
+                progress(count)
+
+    # 文件打开失败时不能删除（可能是已有的文件）
+    created = False
+    try:
+        if output_format == "col":
+            kinds = [COL_KINDS.get(t, "dict") for t in types] if types else None
+            with ColumnFileWriter(save_path, headers, kinds) as writer:
+                created = True
+                pump(writer.write)
+        else:
+            with open(save_path, "w", encoding="utf-8") as f:
+                created = True
+                if output_format == "jsonl":
+                    writer = JsonLinesWriter(f, compact=compact)
+                else:
+                    writer = JsonArrayWriter(f, indent=2, compact=compact)
+                pump(lambda row: writer.write(dict(zip(headers, row))))
+                writer.close()
+    except BaseException as e:
+        # 取消、读取或写入出错时不留下不完整的文件
+        if created and os.path.exists(save_path):
+            os.remove(save_path)
+        if isinstance(e, OSError):
+            raise RuntimeError(f"保存失败: {e}") from e
+        raise
+    return count
+
+
+# ----------------- 批量转换 -----------------
+
+def find_input_files(pattern):
+    """目录中的全部 CSV/Excel 文件，或匹配通配符的 CSV/Excel 文件，按文件名排序。"""
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern)
+    exts = EXCEL_EXTS | {".csv"}
+    paths = [
+        p for p in paths
+        if os.path.isfile(p) and os.path.splitext(p)[1].lower() in exts
+        # Excel 打开文件时生成的临时文件
+        and not os.path.basename(p).startswith("~$")
+    ]
+    return sorted(paths)
+
+
+def _output_path(out_dir, path, sheet, ext):
+    """CSV 输出 “文件名.json”，Excel 输出 “文件名-工作表名.json”。"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if sheet is not None:
+        stem += "-" + re.sub(r'[\\/:*?"<>|]', "_", sheet)
+    return os.path.join(out_dir, stem + ext)
+
+
+def _convert_one(path, sheet_name, rows, out_dir, output_format, compact, infer_types):
+    """转换一个 CSV 或工作表，返回 (文件名, 工作表名, 行数, 耗时, 状态)。"""
+    ext = OUTPUT_EXTS[output_format]
+    started = time.perf_counter()
+    try:
+        records = _select_columns(rows, infer_types)
+        headers, _, types = next(records)
+        count = write_records(
+            headers, records, _output_path(out_dir, path, sheet_name, ext), output_format, compact, types=types
+        )
+        status = "完成"
+    except Exception as e:
+        # 每个工作表单独记录错误，不影响同一文件中已经转换或之后的工作表
+        count = 0
+        status = str(e) or type(e).__name__
+    return os.path.basename(path), sheet_name or "", count, time.perf_counter() - started, status
+
+
+def _convert_file_sheets(path, out_dir, output_format, compact, infer_types):
+    """子进程：转换一个文件的每一个工作表，返回每个工作表的结果列表。
+
+    工作簿只打开一次（read_only 模式下每次打开都要重新解析共享字符串表）。
+    """
+    if os.path.splitext(path)[1].lower() == ".csv":
+        return [_convert_one(path, None, _iter_csv_rows(path), out_dir, output_format, compact, infer_types)]
+
+    _require_openpyxl()
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return [
+            _convert_one(path, sheet.title, _iter_sheet_rows(sheet), out_dir, output_format, compact, infer_types)
+            for sheet in wb.worksheets
+        ]
+    finally:
+        wb.close()
+
+
+def batch_convert(paths, out_dir, output_format="json", compact=False, infer_types=False,
+                  progress=None, max_workers=None):
+    """在进程池中转换多个文件，返回 [(文件名, 工作表名, 行数, 耗时, 状态), ...]（按输入顺序）。
+
+    progress(已完成文件数, 文件总数) 每完成一个文件以及每隔 BATCH_POLL_SECONDS 秒调用一次，
+    在其中抛出异常（如 JobCancelled）可以取消：立即返回，尚未开始的文件不再转换，
+    正在转换的文件在后台进程中转换完为止。
+    """
+    if any(os.path.splitext(p)[1].lower() in EXCEL_EXTS for p in paths):
+        _require_openpyxl()
+    os.makedirs(out_dir, exist_ok=True)
+
+    workers = max_workers or os.cpu_count() or 1
+    results = {}
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(paths)) or 1)
+    try:
+        futures = {
+            pool.submit(_convert_file_sheets, path, out_dir, output_format, compact, infer_types): i
+            for i, path in enumerate(paths)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=BATCH_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    # 文件无法打开等：记录错误，继续转换其他文件
+                    results[i] = [(os.path.basename(paths[i]), "", 0, 0.0, str(e))]
+            if progress:
+                progress(len(results), len(paths))
+    except BaseException:
+        # 出错或被取消时不等待正在转换的文件
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return [entry for i in range(len(paths)) for entry in results[i]]
+
+
+class BatchDialog(tk.Toplevel):
+    """批量转换窗口：选择输入和输出目录，结果汇总显示在表格中。"""
+
+    COLUMNS = (("file", "文件", 220), ("sheet", "工作表", 120), ("rows", "行数", 80),
+               ("seconds", "耗时(秒)", 80), ("status", "状态", 200))
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("批量转换")
+        self.geometry("760x460")
+
+        self.input_var = tk.StringVar()
+        self.output_var = tk.StringVar()
+        self.status_var = tk.StringVar(value="输入目录，或通配符如 D:/data/*.xlsx")
+        self.runner = JobRunner(self)
+
+        self._build_ui()
+
+    def _build_ui(self):
+        frm = ttk.Frame(self, padding=10)
+        frm.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(frm, text="输入目录/通配符：").grid(row=0, column=0, sticky="w")
+        ttk.Entry(frm, textvariable=self.input_var).grid(row=0, column=1, sticky="we", padx=(0, 5))
+        ttk.Button(frm, text="选择目录", command=self.browse_input).grid(row=0, column=2, sticky="e")
+
+        ttk.Label(frm, text="输出目录：").grid(row=1, column=0, sticky="w", pady=(4, 0))
+        ttk.Entry(frm, textvariable=self.output_var).grid(row=1, column=1, sticky="we", padx=(0, 5), pady=(4, 0))
+        ttk.Button(frm, text="选择目录", command=self.browse_output).grid(row=1, column=2, sticky="e", pady=(4, 0))
+
+        frm_buttons = ttk.Frame(frm)
+        frm_buttons.grid(row=2, column=0, sticky="w", pady=(8, 4))
+        ttk.Button(frm_buttons, text="开始转换", command=self.start).pack(side=tk.LEFT)
+        ttk.Button(frm_buttons, text="取消", command=self.runner.cancel).pack(side=tk.LEFT, padx=(5, 0))
+
+        self.progress = ttk.Progressbar(frm, orient=tk.HORIZONTAL, mode="determinate")
+        self.progress.grid(row=2, column=1, columnspan=2, sticky="we", pady=(8, 4))
+
+        self.tree = ttk.Treeview(frm, columns=[c[0] for c in self.COLUMNS], show="headings")
+        for name, title, width in self.COLUMNS:
+            self.tree.heading(name, text=title)
+            self.tree.column(name, width=width, anchor="e" if name in ("rows", "seconds") else "w")
+        self.tree.grid(row=3, column=0, columnspan=3, sticky="nsew", pady=(4, 0))
+
+        scroll = ttk.Scrollbar(frm, orient=tk.VERTICAL, command=self.tree.yview)
+        scroll.grid(row=3, column=3, sticky="nsw", pady=(4, 0))
+        self.tree.config(yscrollcommand=scroll.set)
+
+        status = ttk.Label(self, textvariable=self.status_var, relief=tk.SUNKEN, anchor="w")
+        status.pack(side=tk.BOTTOM, fill=tk.X)
+
+        frm.columnconfigure(1, weight=1)
+        frm.rowconfigure(3, weight=1)
+
+    def browse_input(self):
+        path = filedialog.askdirectory(title="选择包含 CSV/Excel 文件的目录", parent=self)
+        if path:
+            self.input_var.set(path)
+            if not self.output_var.get():
+                self.output_var.set(path)
+
+    def browse_output(self):
+        path = filedialog.askdirectory(title="选择输出目录", parent=self)
+        if path:
+            self.output_var.set(path)
+
+    def start(self):
+        pattern = self.input_var.get().strip()
+        paths = find_input_files(pattern) if pattern else []
+        if not paths:
+            messagebox.showerror("错误", "没有找到 CSV 或 Excel 文件", parent=self)
+            return
+        out_dir = self.output_var.get().strip()
+        if not out_dir:
+            out_dir = pattern if os.path.isdir(pattern) else os.path.dirname(paths[0])
+            self.output_var.set(out_dir)
+
+        started = self.runner.start(
+            self._batch_job,
+            paths,
+            out_dir,
+            self.app.output_format.get(),
+            self.app.compact.get(),
+            self.app.infer_types.get(),
+            on_done=self._on_done,
+            on_error=self._on_error,
+            on_progress=self._show_progress,
+            on_cancel=self._on_cancelled,
+        )
+        if not started:
+            messagebox.showinfo("提示", "已有任务在运行，请稍候或先取消", parent=self)
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.progress.config(maximum=len(paths), value=0)
+        self.status_var.set(f"正在转换 {len(paths)} 个文件...")
+
+    @staticmethod
+    def _batch_job(job, paths, out_dir, output_format, compact, infer_types):
+        """后台线程：返回 (结果列表, 总耗时)。"""
+        started = time.perf_counter()
+
+        def progress(done, total):
+            job.progress(done, total, f"正在转换... {done}/{total} 个文件", force=done == total)
+
+        results = batch_convert(paths, out_dir, output_format, compact, infer_types, progress)
+        return results, time.perf_counter() - started
+
+    def _show_progress(self, done, total, text):
+        self.progress.config(maximum=total, value=done)
+        if text:
+            self.status_var.set(text)
+
+    def _on_done(self, result):
+        results, elapsed = result
+        for name, sheet, count, seconds, status in results:
+            self.tree.insert("", tk.END, values=(name, sheet, count, f"{seconds:.2f}", status))
+        failed = sum(1 for r in results if r[4] != "完成")
+        rows = sum(r[2] for r in results)
+        self.status_var.set(
+            f"转换完成：{len(results)} 个工作表，共 {rows} 条记录，{failed} 个未转换，用时 {elapsed:.1f} 秒"
+        )
+
+    def _on_error(self, error):
+        self.progress.config(value=0)
+        messagebox.showerror("错误", str(error), parent=self)
+        self.status_var.set("错误")
+
+    def _on_cancelled(self):
+        self.progress.config(value=0)
+        self.status_var.set("已取消")
+
+
 class ExcelToJsonApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Excel/CSV 转 JSON 工具")
-        self.geometry("780x420")
+        self.geometry("780x480")
         self.resizable(False, False)
 
         self.file_path = tk.StringVar()
         self.status_var = tk.StringVar(value="就绪")
+        self.output_format = tk.StringVar(value="json")
+        self.compact = tk.BooleanVar(value=False)
+        self.infer_types = tk.BooleanVar(value=True)
+        self.runner = JobRunner(self)
 
         self._build_ui()
 
@@ -74,22 +514,54 @@ class ExcelToJsonApp(tk.Tk):
         lbl_info.grid(row=1, column=0, columnspan=3, sticky="w", pady=(8, 4))
 
         # 预览与转换按钮
-        btn_preview = ttk.Button(frm, text="预览 JSON", command=self.preview_json)
-        btn_preview.grid(row=2, column=0, sticky="w", pady=(4, 4))
+        frm_buttons = ttk.Frame(frm)
+        frm_buttons.grid(row=2, column=0, sticky="w", pady=(4, 4))
+
+        btn_preview = ttk.Button(frm_buttons, text="预览 JSON", command=self.preview_json)
+        btn_preview.pack(side=tk.LEFT)
+
+        btn_cancel = ttk.Button(frm_buttons, text="取消", command=self.runner.cancel)
+        btn_cancel.pack(side=tk.LEFT, padx=(5, 0))
+
+        self.progress = ttk.Progressbar(frm, orient=tk.HORIZONTAL, mode="determinate")
+        self.progress.grid(row=2, column=1, sticky="we", padx=(5, 5), pady=(4, 4))
 
         btn_convert = ttk.Button(frm, text="转换为 JSON 并保存", command=self.convert_and_save)
         btn_convert.grid(row=2, column=2, sticky="e", pady=(4, 4))
 
+        # 输出格式
+        frm_format = ttk.Frame(frm)
+        frm_format.grid(row=3, column=0, columnspan=2, sticky="w", pady=(4, 0))
+        ttk.Label(frm_format, text="输出格式：").pack(side=tk.LEFT)
+        ttk.Radiobutton(frm_format, text="JSON 数组", value="json", variable=self.output_format).pack(side=tk.LEFT)
+        ttk.Radiobutton(
+            frm_format, text="JSON Lines（每行一条）", value="jsonl", variable=self.output_format
+        ).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Radiobutton(
+            frm_format, text="列式二进制（.col）", value="col", variable=self.output_format
+        ).pack(side=tk.LEFT, padx=(10, 0))
+
+        frm_options = ttk.Frame(frm)
+        frm_options.grid(row=4, column=0, columnspan=3, sticky="w", pady=(4, 0))
+        ttk.Checkbutton(frm_options, text="紧凑格式（不缩进）", variable=self.compact).pack(side=tk.LEFT)
+        ttk.Checkbutton(
+            frm_options, text="自动识别类型（数字/布尔/日期/空值）", variable=self.infer_types
+        ).pack(side=tk.LEFT, padx=(20, 0))
+
+        # 批量转换（使用上面的输出格式选项）
+        btn_batch = ttk.Button(frm, text="批量转换...", command=self.open_batch)
+        btn_batch.grid(row=3, column=2, sticky="e", pady=(4, 0))
+
         # 预览区域
-        lbl_preview = ttk.Label(frm, text="JSON 预览（最多显示前 20 条）：")
-        lbl_preview.grid(row=3, column=0, columnspan=3, sticky="w", pady=(8, 0))
+        lbl_preview = ttk.Label(frm, text=f"JSON 预览（只读取前 {PREVIEW_ROWS} 条）：")
+        lbl_preview.grid(row=5, column=0, columnspan=3, sticky="w", pady=(8, 0))
 
         self.text_preview = tk.Text(frm, height=12, width=90)
-        self.text_preview.grid(row=4, column=0, columnspan=3, sticky="nsew", pady=(4, 0))
+        self.text_preview.grid(row=6, column=0, columnspan=3, sticky="nsew", pady=(4, 0))
 
         # 滚动条
         scroll = ttk.Scrollbar(frm, orient=tk.VERTICAL, command=self.text_preview.yview)
-        scroll.grid(row=4, column=3, sticky="nsw")
+        scroll.grid(row=6, column=3, sticky="nsw")
         self.text_preview.config(yscrollcommand=scroll.set)
 
         # 状态栏
@@ -98,7 +570,7 @@ class ExcelToJsonApp(tk.Tk):
 
         # grid 行列权重
         frm.columnconfigure(1, weight=1)
-        frm.rowconfigure(4, weight=1)
+        frm.rowconfigure(6, weight=1)
 
     # ----------------- 文件选择 -----------------
 
@@ -118,144 +590,154 @@ class ExcelToJsonApp(tk.Tk):
 
     # ----------------- 数据读取 -----------------
 
-    def _read_csv(self, path):
-        """使用标准库 csv 读取数据，第一行作为字段名。"""
-        data = []
-        with open(path, "r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.reader(f)
-            try:
-                headers = next(reader, None)
-            except StopIteration:
-                headers = None
-            if not headers:
-                raise ValueError("CSV 文件为空或没有表头")
-            headers = [str(h).strip() if h is not None else "" for h in headers]
-            if not any(headers):
-                raise ValueError("第一行没有有效的字段名")
-
-            for row in reader:
-                if not any(cell.strip() for cell in row if isinstance(cell, str)) and all(
-                    cell in (None, "") for cell in row
-                ):
-                    # 整行为空
-                    continue
-                item = {}
-                for key, value in zip(headers, row):
-                    if not key:
-                        continue
-                    item[key] = value
-                if item:
-                    data.append(item)
-        return data
-
-    def _read_excel_first_sheet(self, path):
-        """Read first sheet, treat first row as headers. Return list of dicts.
-        需要 openpyxl。
-        """
-        if not _HAS_OPENPYXL:
-            raise RuntimeError("解析 Excel 文件需要 openpyxl，请先执行: pip install openpyxl/sudo apt install python3-openpyxl")
-
-        wb = load_workbook(path, read_only=True, data_only=True)
-        sheet = wb.worksheets[0]  # 第一个 sheet
-
-        rows = list(sheet.rows)
-        if not rows:
-            raise ValueError("Excel 文件为空或第一个 sheet 没有数据")
-
-        # 第一行字段名
-        headers = [str(cell.value).strip() if cell.value is not None else "" for cell in rows[0]]
-
-        if not any(headers):
-            raise ValueError("第一行没有有效的字段名")
-
-        data = []
-        for row in rows[1:]:  # 从第二行起为数据
-            values = [cell.value for cell in row]
-            # 如果整行为空，则跳过
-            if all(v is None for v in values):
-                continue
-            item = {}
-            for key, value in zip(headers, values):
-                if not key:
-                    # 忽略空字段名的列
-                    continue
-                item[key] = value
-            if item:
-                data.append(item)
-        return data
-
-    def _load_data(self):
+    def _get_input_path(self):
+        """检查输入文件，返回路径。"""
         path = self.file_path.get().strip()
         if not path:
             raise ValueError("请先选择文件")
         if not os.path.exists(path):
             raise ValueError("文件不存在")
+        return path
 
-        ext = os.path.splitext(path)[1].lower()
-
-        self.status_var.set("正在读取数据...")
-        self.update_idletasks()
-
-        if ext == ".csv":
-            data = self._read_csv(path)
-        elif ext in {".xls", ".xlsx", ".xlsm", ".xltx", ".xltm"}:
-            data = self._read_excel_first_sheet(path)
-        else:
-            raise ValueError("不支持的文件类型，请选择 CSV 或 Excel 文件")
+    def _load_preview(self, job, path, infer_types=False):
+        """后台线程：只读取前 PREVIEW_ROWS 行（不能操作界面控件）。
 
-        self.status_var.set(f"读取完成，共 {len(data)} 条记录")
-        return data
+        返回 (字段名, 记录列表, 总行数, 列类型)；总行数未知时为 None。
+        """
+        records = iter_records(path, infer_types, limit=PREVIEW_ROWS)
+        headers, total, types = next(records)
+        rows = [dict(zip(headers, row)) for row in records]
+        return headers, rows, total, types
+
+    # ----------------- 后台任务 -----------------
+
+    def _start_job(self, func, *args, on_done, status):
+        started = self.runner.start(
+            func,
+            *args,
+            on_done=on_done,
+            on_error=self._on_job_error,
+            on_progress=self._show_progress,
+            on_cancel=self._on_job_cancelled,
+        )
+        if not started:
+            messagebox.showinfo("提示", "已有任务在运行，请稍候或先取消")
+            return
+        self.progress.config(mode="indeterminate")
+        self.progress.start(20)
+        self.status_var.set(status)
+
+    def _stop_progress(self):
+        self.progress.stop()
+        self.progress.config(mode="determinate", value=0)
+
+    def _show_progress(self, done, total, text):
+        if total:
+            self.progress.stop()
+            self.progress.config(mode="determinate", maximum=total, value=done)
+        if text:
+            self.status_var.set(text)
+
+    def _on_job_error(self, error):
+        self._stop_progress()
+        messagebox.showerror("错误", str(error))
+        self.status_var.set("错误")
+
+    def _on_job_cancelled(self):
+        self._stop_progress()
+        self.status_var.set("已取消")
 
     # ----------------- 按钮动作 -----------------
 
     def preview_json(self):
         try:
-            data = self._load_data()
-            # 仅显示前 20 条
-            preview_data = data[:20]
-            txt = json.dumps(preview_data, ensure_ascii=False, indent=2)
-            self.text_preview.delete("1.0", tk.END)
-            self.text_preview.insert(tk.END, txt)
+            path = self._get_input_path()
         except Exception as e:
             messagebox.showerror("错误", str(e))
             self.status_var.set("错误")
+            return
+
+        self._start_job(
+            self._load_preview, path, self.infer_types.get(), on_done=self._show_preview, status="正在读取数据..."
+        )
+
+    @staticmethod
+    def _describe_types(headers, types):
+        return "，".join(f"{h}: {t}" for h, t in zip(headers, types))
+
+    def _show_preview(self, result):
+        headers, rows, total, types = result
+        self._stop_progress()
+        status = f"预览前 {len(rows)} 条记录"
+        if total is not None:
+            # Excel 记录的表格范围，包含空行，仅供参考
+            status += f"，约 {total} 行"
+        if types:
+            status += f"（列类型 {self._describe_types(headers, types)}）"
+        self.status_var.set(status)
+        txt = json.dumps(rows, ensure_ascii=False, indent=2)
+        self.text_preview.delete("1.0", tk.END)
+        self.text_preview.insert(tk.END, txt)
 
     def convert_and_save(self):
         try:
-            data = self._load_data()
+            path = self._get_input_path()
         except Exception as e:
             messagebox.showerror("错误", str(e))
             return
 
-        if not data:
-            messagebox.showwarning("提示", "没有可导出的数据")
-            return
-
+        output_format = self.output_format.get()
+        ext = OUTPUT_EXTS[output_format]
         # 默认文件名
-        default_name = os.path.splitext(os.path.basename(self.file_path.get()))[0] + ".json"
+        default_name = os.path.splitext(os.path.basename(path))[0] + ext
 
         save_path = filedialog.asksaveasfilename(
             title="保存 JSON 文件",
-            defaultextension=".json",
+            defaultextension=ext,
             initialfile=default_name,
-            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")],
+            filetypes=[("JSON 文件", "*.json *.jsonl"), ("列式文件", "*.col"), ("所有文件", "*.*")],
         )
         if not save_path:
             return
 
-        try:
-            self.status_var.set("正在写入 JSON 文件...")
-            self.update_idletasks()
-            with open(save_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            self.status_var.set("转换完成")
-            messagebox.showinfo("完成", f"已保存到: {save_path}")
-        except Exception as e:
-            messagebox.showerror("错误", f"保存失败: {e}")
-            self.status_var.set("错误")
+        self._start_job(
+            self._convert_file,
+            path,
+            save_path,
+            output_format,
+            self.compact.get(),
+            self.infer_types.get(),
+            on_done=self._on_saved,
+            status="正在转换...",
+        )
+
+    def _convert_file(self, job, path, save_path, output_format="json", compact=False, infer_types=False):
+        """后台线程：边读边写，内存占用与行数无关。返回 (保存路径, 记录数)。
+
+        infer_types 为 True 时只缓存用于推断类型的前几行，不需要第二遍读取。
+        """
+        records = iter_records(path, infer_types)
+        headers, total, types = next(records)
+
+        def progress(count):
+            job.progress(count, total, f"正在转换... 已写入 {count} 行")
+
+        count = write_records(headers, records, save_path, output_format, compact, progress, types)
+        return save_path, count
+
+    def _on_saved(self, result):
+        save_path, count = result
+        self._stop_progress()
+        self.status_var.set(f"转换完成，共 {count} 条记录")
+        messagebox.showinfo("完成", f"已保存到: {save_path}")
+
+    def open_batch(self):
+        BatchDialog(self)
 
 
 if __name__ == "__main__":
+    # pyinstaller 打包后使用进程池需要
+    multiprocessing.freeze_support()
     app = ExcelToJsonApp()
     app.mainloop()
 
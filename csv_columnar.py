@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""列式存储的 CSV 表格
+
+每一行保存为 dict 时，表头字符串在每一行都作为 key 重复一次，每行还有一个
+dict 对象本身的开销（几百字节）。这里按列存储：
+
+- 重复值多的列使用字典编码：不同值只保存一份，每个单元格只占 4 字节的编码
+- 几乎每个值都不同的列（id、email 等）改为普通列表，避免字典本身的开销
+- 过滤结果只保存行号，写出时才重建每一行
+
+按列匹配时只需对每个不同值计算一次（见 distinct、select）。
+匹配键（csv_keys.KeySpec）规范化后的值由 key_column 计算一次并缓存。
+"""
+
+import csv
+from array import array
+
+import csv_join
+from csv_keys import as_key_spec
+
+# 读取这么多行之后检查每一列的重复程度
+SAMPLE_ROWS = 10000
+
+# 不同值占比超过该比例的列改为普通列表存储
+PLAIN_RATIO = 0.5
+
+
+class Column:
+    """单列数据：字典编码（codes + values）或普通列表（plain）。"""
+
+    __slots__ = ("codes", "values", "lookup", "plain")
+
+    def __init__(self):
+        self.codes = array("I")
+        self.values = []
+        self.lookup = {}
+        self.plain = None
+
+    def append(self, value):
+        if self.plain is not None:
+            self.plain.append(value)
+            return
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def to_plain(self):
+        """改为普通列表存储。"""
+        if self.plain is None:
+            values = self.values
+            self.plain = [values[c] for c in self.codes]
+            self.codes = array("I")
+            self.values = []
+            self.lookup = {}
+
+    @property
+    def encoded(self):
+        return self.plain is None
+
+    def __len__(self):
+        return len(self.codes) if self.plain is None else len(self.plain)
+
+    def __getitem__(self, i):
+        if self.plain is not None:
+            return self.plain[i]
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        if self.plain is not None:
+            return iter(self.plain)
+        values = self.values
+        return (values[c] for c in self.codes)
+
+    def distinct(self):
+        """列中出现过的值（字典编码时不需要扫描每一行）。"""
+        if self.plain is not None:
+            return set(self.plain)
+        return set(self.values)
+
+    def scan_values(self):
+        """遍历列中的值：字典编码时每个不同值只出现一次，否则逐行遍历（可能重复）。"""
+        return iter(self.plain) if self.plain is not None else iter(self.values)
+
+    def select(self, predicate, indices=None):
+        """返回 predicate(值) 为真的行号列表；字典编码时每个不同值只计算一次。"""
+        if self.plain is not None:
+            plain = self.plain
+            if indices is None:
+                return [i for i, v in enumerate(plain) if predicate(v)]
+            return [i for i in indices if predicate(plain[i])]
+
+        matched = [bool(predicate(v)) for v in self.values]
+        codes = self.codes
+        if indices is None:
+            return [i for i, c in enumerate(codes) if matched[c]]
+        return [i for i in indices if matched[codes[i]]]
+
+
+class ColumnarTable:
+    """按列存储的表格，headers 为列名列表。"""
+
+    def __init__(self, headers, fill=""):
+        self.headers = list(headers)
+        self.columns = [Column() for _ in self.headers]
+        # 列名重复时与 KeySpec.indices（headers.index）一样以第一列为准
+        self._index = {}
+        for i, name in enumerate(self.headers):
+            self._index.setdefault(name, i)
+        self.fill = fill
+        self._rows = 0
+        self._key_columns = {}
+
+    def __len__(self):
+        return self._rows
+
+    def append(self, row):
+        """追加一行；列数不足时用 fill 补齐，多余的列丢弃。"""
+        columns = self.columns
+        width = len(columns)
+        if len(row) < width:
+            row = list(row) + [self.fill] * (width - len(row))
+        for column, value in zip(columns, row):
+            column.append(value)
+        self._rows += 1
+        if self._rows == SAMPLE_ROWS:
+            self._choose_storage(self.columns)
+
+    @staticmethod
+    def _choose_storage(columns):
+        for column in columns:
+            if column.encoded and len(column.values) > PLAIN_RATIO * len(column):
+                column.to_plain()
+
+    def key_column(self, key):
+        """规范化后的匹配键列（列名或 KeySpec），每个 KeySpec 只计算一次。
+
+        单列键且该列是字典编码时，只对每个不同值做规范化。
+        只能在数据加载完成后调用。
+        """
+        spec = as_key_spec(key)
+        cached = self._key_columns.get(spec)
+        if cached is not None:
+            return cached
+
+        sources = [self.column(name) for name in spec.columns]
+        make = spec.make_key()
+        if len(sources) == 1 and sources[0].encoded:
+            normalized = [make(v) for v in sources[0].values]
+            keys = (normalized[code] for code in sources[0].codes)
+        elif len(sources) == 1:
+            keys = map(make, sources[0])
+        else:
+            keys = map(make, zip(*sources))
+
+        result = Column()
+        for n, value in enumerate(keys, 1):
+            result.append(value)
+            if n == SAMPLE_ROWS:
+                self._choose_storage([result])
+        self._choose_storage([result])
+
+        self._key_columns[spec] = result
+        return result
+
+    def column(self, name):
+        try:
+            return self.columns[self._index[name]]
+        except KeyError:
+            raise ValueError(f"字段不存在：{name}") from None
+
+    def row(self, i):
+        return [column[i] for column in self.columns]
+
+    def iter_rows(self, indices=None):
+        """按行产出列表；indices 为 None 时产出全部行。"""
+        if indices is None:
+            indices = range(self._rows)
+        columns = self.columns
+        for i in indices:
+            yield [column[i] for column in columns]
+
+    def row_dict(self, i):
+        return dict(zip(self.headers, self.row(i)))
+
+    def iter_dicts(self, indices=None):
+        headers = self.headers
+        for row in self.iter_rows(indices):
+            yield dict(zip(headers, row))
+
+    def write_csv(self, path, indices=None, encoding="utf-8-sig", extra_headers=(), extra=None):
+        """写出表头和 indices 指定的行（默认全部）。
+
+        extra(行号) 返回追加在每一行末尾的列，列名为 extra_headers。
+        """
+        if indices is None:
+            indices = range(self._rows)
+        with open(path, "w", newline="", encoding=encoding) as f:
+            writer = csv.writer(f)
+            writer.writerow(self.headers + list(extra_headers))
+            if extra is None:
+                writer.writerows(self.iter_rows(indices))
+            else:
+                writer.writerows(row + extra(i) for i, row in zip(indices, self.iter_rows(indices)))
+
+
+def load_csv(path, encoding="utf-8-sig", strip=False, progress=None):
+    """读取 CSV 为 ColumnarTable，第一行作为表头。
+
+    strip=True 时去掉每个数据单元格的首尾空白（表头保持原样）。
+    progress(已读取字节数, 文件大小) 与 csv_join.iter_lines 相同。
+    """
+    rows = csv_join.iter_csv_rows(path, encoding, progress)
+    headers = next(rows, None)
+    if headers is None:
+        raise ValueError("CSV 文件为空或没有表头")
+
+    table = ColumnarTable(headers)
+    append = table.append
+    if strip:
+        for row in rows:
+            append([cell.strip() for cell in row])
+    else:
+        for row in rows:
+            append(row)
+    return table
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""CSV 流式匹配工具
+
+逐行读取 CSV，不把整个文件加载到内存：
+- 第一遍只收集匹配字段的值集合
+- 第二遍逐行判断并直接写入输出文件
+
+内存占用只与值集合的大小有关，与行数无关。
+值集合（哈希表）超过内存上限时，自动改用外部排序归并连接：
+两边分别排序后写入临时文件，再按 key 顺序归并。
+anti-join 还可以用布隆过滤器预筛选，只为"可能匹配"的值保留精确集合。
+
+hash_join(parallel=True) 对大文件的只读扫描使用 csv_scan 多进程并行解析。
+
+所有 column / key 参数既可以是列名（只去除首尾空格），也可以是 csv_keys.KeySpec
+（多列组合键 + 规范化规则链）；每行的键只计算一次。
+"""
+
+import csv
+import heapq
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from operator import itemgetter
+
+import csv_scan
+from csv_keys import as_key_spec
+from sketches import BloomFilter
+
+# 每读取多少行报告一次进度
+PROGRESS_EVERY = 10000
+
+# 哈希表默认内存上限，超过后改用外部排序归并连接
+MEMORY_BUDGET = 512 << 20
+
+# 集合/字典中每个条目除字符串本身以外的大致开销（字节）
+_ENTRY_OVERHEAD = 80
+
+
+class MemoryBudgetExceeded(Exception):
+    """哈希表超过内存上限。"""
+
+
+def iter_lines(path, encoding="utf-8-sig", progress=None):
+    """逐行读取文本，progress(已读取字节数, 文件大小) 每 PROGRESS_EVERY 行回调一次。"""
+    total = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        for n, line in enumerate(f):
+            offset += len(line)
+            if progress and n % PROGRESS_EVERY == 0:
+                progress(offset, total)
+            if n == 0 and encoding == "utf-8-sig":
+                yield line.decode("utf-8-sig")
+            else:
+                yield line.decode("utf-8" if encoding == "utf-8-sig" else encoding)
+        if progress:
+            progress(offset, total)
+
+
+def iter_csv_rows(path, encoding="utf-8-sig", progress=None):
+    """流式读取 CSV：第一次产出表头，之后逐行产出列表。"""
+    return csv.reader(iter_lines(path, encoding, progress))
+
+
+def read_headers(path, encoding="utf-8-sig"):
+    with open(path, newline="", encoding=encoding) as f:
+        return next(csv.reader(f), [])
+
+
+def column_index(headers, name):
+    try:
+        return headers.index(name)
+    except ValueError:
+        raise ValueError(f"字段不存在：{name}")
+
+
+def key_getter(headers, key):
+    """返回 get(row)：取出一行规范化后的匹配键；字段不存在时抛出 ValueError。"""
+    return as_key_spec(key).bind(headers)
+
+
+def _drop_columns(row, indices):
+    """去掉 indices 中的列（连接输出中 B 的键列）。"""
+    return [cell for i, cell in enumerate(row) if i not in indices]
+
+
+def _iter_column(path, column, encoding="utf-8-sig", progress=None):
+    """逐行产出规范化后的非空键。"""
+    rows = iter_csv_rows(path, encoding, progress)
+    get_key = key_getter(next(rows, []), column)
+    for row in rows:
+        value = get_key(row)
+        if value:
+            yield value
+
+
+def collect_keys(path, column, encoding="utf-8-sig", progress=None, memory_budget=None):
+    """第一遍：收集规范化后的非空键。
+
+    估算占用超过 memory_budget 字节时抛出 MemoryBudgetExceeded。
+    """
+    if not memory_budget:
+        return set(_iter_column(path, column, encoding, progress))
+
+    keys = set()
+    used = 0
+    for key in _iter_column(path, column, encoding, progress):
+        if key not in keys:
+            keys.add(key)
+            used += sys.getsizeof(key) + _ENTRY_OVERHEAD
+            if used > memory_budget:
+                raise MemoryBudgetExceeded()
+    return keys
+
+
+def semi_join(path, column, keys, out_path, anti=False, encoding="utf-8-sig", progress=None):
+    """第二遍：逐行判断 column 的值是否在 keys 中，匹配的行直接写入 out_path。
+
+    anti=True 时保留不在 keys 中的行。返回 (总行数, 保留行数)。
+    """
+    rows = iter_csv_rows(path, encoding, progress)
+    headers = next(rows, [])
+    get_key = key_getter(headers, column)
+
+    total = kept = 0
+    with open(out_path, "w", newline="", encoding=encoding) as out:
+        writer = csv.writer(out)
+        writer.writerow(headers)
+        for row in rows:
+            total += 1
+            if (get_key(row) in keys) != anti:
+                writer.writerow(row)
+                kept += 1
+    return total, kept
+
+
+def pass_progress(progress, sizes, index):
+    """多遍扫描时把第 index 遍的 (offset, size) 进度映射为整体进度，sizes 为每一遍的文件大小。"""
+    if progress is None:
+        return None
+    done_before = sum(sizes[:index])
+    total = sum(sizes) or 1
+
+    def report(offset, size):
+        progress(done_before + offset, total)
+
+    return report
+
+
+# ----------------- 跨文件连接 -----------------
+
+# semi：保留 A 中能匹配的行；anti：保留 A 中不能匹配的行；
+# inner：A 与 B 匹配的行拼接输出；left：A 的所有行，匹配不到时 B 的列留空
+JOIN_TYPES = ("semi", "anti", "inner", "left")
+
+
+def _row_size(row):
+    """估算一行（字符串列表）占用的内存。"""
+    return sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+
+
+def _collect_rows(path, column, keys=None, encoding="utf-8-sig", progress=None, memory_budget=None):
+    """收集 {key: [除 key 列以外的其他列, ...]}；keys 不为空时只保留其中的 key。"""
+    rows = iter_csv_rows(path, encoding, progress)
+    headers = next(rows, [])
+    get_key = key_getter(headers, column)
+    key_columns = frozenset(as_key_spec(column).indices(headers))
+
+    table = {}
+    used = 0
+    for row in rows:
+        key = get_key(row)
+        if not key or (keys is not None and key not in keys):
+            continue
+        rest = _drop_columns(row, key_columns)
+        table.setdefault(key, []).append(rest)
+        if memory_budget:
+            used += _row_size(rest) + sys.getsizeof(key) + _ENTRY_OVERHEAD
+            if used > memory_budget:
+                raise MemoryBudgetExceeded()
+    return _drop_columns(headers, key_columns), table
+
+
+def _output_headers(headers_a, headers_b):
+    """B 的列名与 A 重复时加上 (B) 后缀。"""
+    names = set(headers_a)
+    return list(headers_a) + [f"{h}(B)" if h in names else h for h in headers_b]
+
+
+def _write_joined(path_a, key_a, how, table, b_width, out_headers, out_path, encoding, progress):
+    """流式读取 A，按 table（key -> B 的行列表）输出连接结果。"""
+    rows = iter_csv_rows(path_a, encoding, progress)
+    headers = next(rows, [])
+    get_key = key_getter(headers, key_a)
+    empty_b = [""] * b_width
+
+    total = kept = 0
+    with open(out_path, "w", newline="", encoding=encoding) as out:
+        writer = csv.writer(out)
+        writer.writerow(out_headers)
+        for row in rows:
+            total += 1
+            row = row + [""] * (len(headers) - len(row))
+            matches = table.get(get_key(row))
+            if matches:
+                writer.writerows(row + m + [""] * (b_width - len(m)) for m in matches)
+                kept += len(matches)
+            elif how == "left":
+                writer.writerow(row + empty_b)
+                kept += 1
+    return total, kept
+
+
+def _use_parallel(parallel, path):
+    return parallel and os.path.getsize(path) >= csv_scan.PARALLEL_MIN_SIZE
+
+
+def _gather_keys(path, column, encoding, progress, memory_budget=None, parallel=False, within=None):
+    """收集非空键（within 不为 None 时只保留其中的键），大文件可以多进程并行扫描。"""
+    if _use_parallel(parallel, path):
+        keys = csv_scan.scan_keys(path, column, encoding, within, progress, memory_budget=memory_budget)
+        # 并行扫描时各分块分别收集，合并后再检查内存上限
+        if memory_budget and sum(map(sys.getsizeof, keys)) + _ENTRY_OVERHEAD * len(keys) > memory_budget:
+            raise MemoryBudgetExceeded()
+        return keys
+    if within is None:
+        return collect_keys(path, column, encoding, progress, memory_budget)
+    return {key for key in _iter_column(path, column, encoding, progress) if key in within}
+
+
+def hash_join(
+    path_a, key_a, path_b, key_b, out_path, how="semi",
+    encoding="utf-8-sig", progress=None, memory_budget=MEMORY_BUDGET, parallel=False,
+):
+    """用文件 B 的 key 过滤/连接文件 A，结果直接写入 out_path，输出行的顺序与 A 一致。
+
+    较小的文件作为哈希表一侧，较大的文件只做流式扫描：
+    - B 较小：读取 B 建立哈希表，然后流式扫描 A 输出
+    - A 较小：先收集 A 的 key 集合，流式扫描 B 时只保留能匹配的 key（或 B 的行），
+      最后再流式扫描一遍 A 输出
+
+    哈希表的估算占用超过 memory_budget 字节时自动改用 sort_merge_join。
+    parallel=True 时，大文件上只需要收集 key 或按 key 过滤的扫描用多进程并行完成。
+
+    返回 {"total": A 的行数, "kept": 输出行数, "build": "A"、"B" 或 "sort-merge"}。
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f"不支持的连接方式：{how}")
+
+    size_a = os.path.getsize(path_a)
+    size_b = os.path.getsize(path_b)
+    headers_a = read_headers(path_a, encoding)
+    headers_b = read_headers(path_b, encoding)
+    key_getter(headers_a, key_a)
+    key_getter(headers_b, key_b)
+
+    build = "B" if size_b <= size_a else "A"
+    try:
+        if build == "B":
+            sizes = [size_b, size_a]
+            if how in ("semi", "anti"):
+                keys = _gather_keys(
+                    path_b, key_b, encoding, pass_progress(progress, sizes, 0), memory_budget, parallel
+                )
+            else:
+                b_headers, table = _collect_rows(
+                    path_b, key_b, None, encoding, pass_progress(progress, sizes, 0), memory_budget
+                )
+        else:
+            sizes = [size_a, size_b, size_a]
+            keys_a = _gather_keys(
+                path_a, key_a, encoding, pass_progress(progress, sizes, 0), memory_budget, parallel
+            )
+            if how in ("semi", "anti"):
+                keys = _gather_keys(
+                    path_b, key_b, encoding, pass_progress(progress, sizes, 1), memory_budget,
+                    parallel=parallel, within=keys_a
+                )
+            else:
+                b_headers, table = _collect_rows(
+                    path_b, key_b, keys_a, encoding, pass_progress(progress, sizes, 1), memory_budget
+                )
+            del keys_a
+    except MemoryBudgetExceeded:
+        keys = table = keys_a = None
+        return sort_merge_join(
+            path_a, key_a, path_b, key_b, out_path, how, encoding, progress, memory_budget
+        )
+
+    last = pass_progress(progress, sizes, len(sizes) - 1)
+    if how in ("semi", "anti") and _use_parallel(parallel, path_a):
+        total, kept = csv_scan.scan_filter(
+            path_a, key_a, keys, out_path, how == "anti", encoding, last, memory_budget=memory_budget
+        )
+    elif how in ("semi", "anti"):
+        total, kept = semi_join(path_a, key_a, keys, out_path, how == "anti", encoding, last)
+    else:
+        total, kept = _write_joined(
+            path_a, key_a, how, table, len(b_headers),
+            _output_headers(headers_a, b_headers), out_path, encoding, last
+        )
+    return {"total": total, "kept": kept, "build": build}
+
+
+# ----------------- 外部排序归并连接 -----------------
+
+def _spill(buffer, tmpdir):
+    """把按 key 排序后的缓冲区写入临时文件（每行：key + 原始各列），返回文件路径。"""
+    buffer.sort(key=itemgetter(0))
+    fd, path = tempfile.mkstemp(suffix=".csv", dir=tmpdir)
+    with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerows([key] + row for key, row in buffer)
+    return path
+
+
+def _write_sorted_runs(path, column, tmpdir, memory_budget, keys_only, encoding, progress):
+    """读取 CSV，按内存上限分批排序后写入临时文件。
+
+    keys_only=True 时只保存去重后的非空 key；否则保存每一行（A 侧保留全部列，
+    包括 key 为空的行）。返回 (表头, 临时文件列表, 行数)。
+    """
+    rows = iter_csv_rows(path, encoding, progress)
+    headers = next(rows, [])
+    get_key = key_getter(headers, column)
+
+    runs = []
+    buffer = []
+    used = 0
+    count = 0
+    for row in rows:
+        count += 1
+        key = get_key(row)
+        if keys_only:
+            if not key:
+                continue
+            buffer.append((key, []))
+            used += sys.getsizeof(key) + _ENTRY_OVERHEAD
+        else:
+            buffer.append((key, row))
+            used += _row_size(row) + _ENTRY_OVERHEAD
+        if used > memory_budget:
+            if keys_only:
+                buffer = [(k, []) for k in set(k for k, _ in buffer)]
+            runs.append(_spill(buffer, tmpdir))
+            buffer = []
+            used = 0
+
+    if buffer:
+        if keys_only:
+            buffer = [(k, []) for k in set(k for k, _ in buffer)]
+        runs.append(_spill(buffer, tmpdir))
+    return headers, runs, count
+
+
+def _iter_run(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            yield row[0], row[1:]
+
+
+def _merged_groups(runs):
+    """归并所有临时文件，按 key 分组产出 (key, [(key, row), ...] 的迭代器)。"""
+    merged = heapq.merge(*(_iter_run(r) for r in runs), key=itemgetter(0))
+    return itertools.groupby(merged, key=itemgetter(0))
+
+
+def sort_merge_join(
+    path_a, key_a, path_b, key_b, out_path, how="semi",
+    encoding="utf-8-sig", progress=None, memory_budget=MEMORY_BUDGET,
+):
+    """外部排序归并连接：内存占用不超过 memory_budget（加上同一个 key 的 B 侧行）。
+
+    与 hash_join 的结果相同，但输出行按 key 排序，而不是 A 的原始顺序。
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f"不支持的连接方式：{how}")
+
+    size_a = os.path.getsize(path_a)
+    size_b = os.path.getsize(path_b)
+    sizes = [size_a, size_b, size_a]
+    keys_only = how in ("semi", "anti")
+
+    tmpdir = tempfile.mkdtemp(prefix="csv_join_")
+    try:
+        headers_a, runs_a, total = _write_sorted_runs(
+            path_a, key_a, tmpdir, memory_budget, False, encoding, pass_progress(progress, sizes, 0)
+        )
+        headers_b, runs_b, _ = _write_sorted_runs(
+            path_b, key_b, tmpdir, memory_budget, keys_only, encoding, pass_progress(progress, sizes, 1)
+        )
+
+        key_columns_b = frozenset(as_key_spec(key_b).indices(headers_b))
+        b_headers = _drop_columns(headers_b, key_columns_b)
+        b_width = len(b_headers)
+        empty_b = [""] * b_width
+        if keys_only:
+            out_headers = headers_a
+        else:
+            out_headers = _output_headers(headers_a, b_headers)
+
+        merge_progress = pass_progress(progress, sizes, 2)
+        done = kept = 0
+        b_groups = _merged_groups(runs_b)
+        b_key, b_group = next(b_groups, (None, None))
+
+        with open(out_path, "w", newline="", encoding=encoding) as out:
+            writer = csv.writer(out)
+            writer.writerow(out_headers)
+
+            for key, a_group in _merged_groups(runs_a):
+                while b_key is not None and b_key < key:
+                    b_key, b_group = next(b_groups, (None, None))
+
+                matched = bool(key) and b_key == key
+                matches = None
+                if matched and not keys_only:
+                    matches = []
+                    for _, row in b_group:
+                        # 去掉 key 列，与 hash_join 的输出一致
+                        rest = _drop_columns(row, key_columns_b)
+                        matches.append(rest + [""] * (b_width - len(rest)))
+
+                for _, row in a_group:
+                    done += 1
+                    if merge_progress and done % PROGRESS_EVERY == 0:
+                        merge_progress(size_a * done // max(total, 1), size_a)
+                    if keys_only:
+                        if matched != (how == "anti"):
+                            writer.writerow(row)
+                            kept += 1
+                        continue
+                    row = row + [""] * (len(headers_a) - len(row))
+                    if matches:
+                        writer.writerows(row + m for m in matches)
+                        kept += len(matches)
+                    elif how == "left":
+                        writer.writerow(row + empty_b)
+                        kept += 1
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return {"total": total, "kept": kept, "build": "sort-merge"}
+
+
+# ----------------- 布隆过滤器预筛选的 anti-join -----------------
+
+def count_lines(path, chunk_size=1 << 20):
+    """快速统计文件行数（按字节块数换行符），用于估算布隆过滤器容量。"""
+    count = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+    return count + (last != b"\n")
+
+
+def bloom_anti_join(
+    path_a, key_a, path_b, key_b, out_path, error_rate=0.01,
+    encoding="utf-8-sig", progress=None,
+):
+    """保留 A 中 key 不在 B 的 key_b 列中的行，结果与 hash_join(how="anti") 相同。
+
+    不为 B 的全部 key 建立集合，而是分四遍扫描：
+    1. B 的 key 加入布隆过滤器（每个值约 1~2 字节）
+    2. A 的 key 中布隆过滤器判断"可能存在"的作为候选（不在过滤器中的一定不匹配）
+    3. B 的 key 中属于候选的才加入精确集合，排除误判
+    4. 流式扫描 A，key 不在精确集合中的行写入 out_path
+
+    A 中大部分 key 都不在 B 中时内存占用远小于完整的 key 集合。
+    返回 {"total", "kept", "build": "bloom", "candidates", "verified", "filter_bytes"}。
+    """
+    size_a = os.path.getsize(path_a)
+    size_b = os.path.getsize(path_b)
+    key_getter(read_headers(path_a, encoding), key_a)
+    key_getter(read_headers(path_b, encoding), key_b)
+    sizes = [size_b, size_a, size_b, size_a]
+
+    bloom = BloomFilter(count_lines(path_b), error_rate)
+    for key in _iter_column(path_b, key_b, encoding, pass_progress(progress, sizes, 0)):
+        bloom.add(key)
+
+    candidates = set()
+    for key in _iter_column(path_a, key_a, encoding, pass_progress(progress, sizes, 1)):
+        if key not in candidates and key in bloom:
+            candidates.add(key)
+
+    verified = set()
+    if candidates:
+        for key in _iter_column(path_b, key_b, encoding, pass_progress(progress, sizes, 2)):
+            if key in candidates:
+                verified.add(key)
+
+    filter_bytes = bloom.nbytes
+    num_candidates = len(candidates)
+    del bloom, candidates
+
+    total, kept = semi_join(
+        path_a, key_a, verified, out_path, anti=True,
+        encoding=encoding, progress=pass_progress(progress, sizes, 3)
+    )
+    return {
+        "total": total,
+        "kept": kept,
+        "build": "bloom",
+        "candidates": num_candidates,
+        "verified": len(verified),
+        "filter_bytes": filter_bytes,
+    }
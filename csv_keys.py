@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""CSV 匹配键：单列或多列组合键 + 规范化规则链
+
+规范化规则（按顺序依次应用）：
+- trim：去除首尾空白
+- casefold：忽略大小写
+- zeros：去除前导零（"000123" -> "123"，"000" -> "0"）
+- nfkc：Unicode NFKC 规范化（全角数字/字母转半角等）
+
+字段列表的写法见 KeySpec.parse；列名中有逗号、| 或首尾空格时用双引号括起来（quote_column）。
+
+多列组合键用 KEY_SEP 连接为一个字符串，可以直接放入集合、排序、写入临时文件。
+所有列都为空的键视为空键，空键不参与匹配。
+
+KeySpec 只保存列名和规则名，可以 pickle 后传给子进程；
+每个进程在读到表头后调用 bind() 得到取键函数。
+"""
+
+import unicodedata
+
+# 组合键各列之间的分隔符（ASCII 单元分隔符，正常数据中不会出现）
+KEY_SEP = "\x1f"
+
+
+def _strip_leading_zeros(value):
+    stripped = value.lstrip("0")
+    if not stripped and value:
+        return "0"
+    return stripped
+
+
+def _nfkc(value):
+    return unicodedata.normalize("NFKC", value)
+
+
+# 规则名 -> (说明, 函数)
+NORMALIZERS = {
+    "trim": ("去除首尾空格", str.strip),
+    "casefold": ("忽略大小写", str.casefold),
+    "zeros": ("去除前导零", _strip_leading_zeros),
+    "nfkc": ("Unicode NFKC 规范化", _nfkc),
+}
+
+DEFAULT_CHAIN = ("trim",)
+
+
+def quote_column(name):
+    """列名中有逗号、|、双引号或首尾空格时加上双引号（"" 表示一个引号），使 KeySpec.parse 能原样解析。"""
+    if name and name == name.strip() and not any(c in name for c in ',|"'):
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _split_fields(text):
+    """把字段列表切分为 [(列名, 规则列表或 None)]，跳过空的未加引号的字段。"""
+    fields = []
+    pos = 0
+    n = len(text)
+    while pos <= n:
+        while pos < n and text[pos].isspace():
+            pos += 1
+        if text.startswith('"', pos):
+            # 带引号的列名：其中的逗号和 | 不分隔
+            parts = []
+            start = pos + 1
+            while True:
+                close = text.find('"', start)
+                if close == -1:
+                    raise ValueError(f"列名的引号没有闭合：{text[pos:]}")
+                parts.append(text[start:close])
+                if not text.startswith('"', close + 1):
+                    break
+                parts.append('"')
+                start = close + 2
+            name = "".join(parts)
+            end = text.find(",", close + 1)
+            end = n if end == -1 else end
+            rest = text[close + 1:end].strip()
+            if rest and not rest.startswith("|"):
+                raise ValueError(f"列名的引号后面只能是 | 规则：{rest}")
+            rules = rest.split("|")[1:] if rest else None
+        else:
+            end = text.find(",", pos)
+            end = n if end == -1 else end
+            name, *rules = text[pos:end].split("|")
+            name = name.strip()
+            rules = rules or None
+            if not name:
+                pos = end + 1
+                continue
+        fields.append((name, rules))
+        pos = end + 1
+    return fields
+
+
+def _compose(chain):
+    """把规则链组合为一个函数。"""
+    funcs = [NORMALIZERS[name][1] for name in chain]
+    if not funcs:
+        return lambda value: value
+    if len(funcs) == 1:
+        return funcs[0]
+
+    def normalize(value):
+        for func in funcs:
+            value = func(value)
+        return value
+
+    return normalize
+
+
+class KeySpec:
+    """匹配键定义：columns 为列名，chains 为每一列的规则链（省略时都用 DEFAULT_CHAIN）。"""
+
+    def __init__(self, columns, chains=None):
+        if isinstance(columns, str):
+            columns = [columns]
+        self.columns = tuple(columns)
+        if not self.columns:
+            raise ValueError("匹配键至少需要一个字段")
+        if chains is None:
+            chains = [DEFAULT_CHAIN] * len(self.columns)
+        self.chains = tuple(tuple(chain) for chain in chains)
+        if len(self.chains) != len(self.columns):
+            raise ValueError("规范化规则的数量与字段数量不一致")
+        for chain in self.chains:
+            for name in chain:
+                if name not in NORMALIZERS:
+                    raise ValueError(f"未知的规范化规则：{name}")
+
+    @classmethod
+    def parse(cls, text, default_chain=DEFAULT_CHAIN):
+        """解析 "civil_id, dept_id|trim|zeros" 形式的字段列表。
+
+        字段之间用逗号分隔；字段名后用 | 指定该列自己的规则链，否则使用 default_chain。
+        列名可以用双引号括起来，如 "dept, id"|zeros。
+        """
+        columns = []
+        chains = []
+        for name, rules in _split_fields(text):
+            columns.append(name)
+            if rules is None:
+                chains.append(tuple(default_chain))
+            else:
+                chains.append(tuple(r.strip() for r in rules if r.strip()))
+        return cls(columns, chains)
+
+    def __eq__(self, other):
+        return isinstance(other, KeySpec) and (self.columns, self.chains) == (other.columns, other.chains)
+
+    def __hash__(self):
+        return hash((self.columns, self.chains))
+
+    def __repr__(self):
+        return f"KeySpec({list(self.columns)!r}, {[list(c) for c in self.chains]!r})"
+
+    def __str__(self):
+        return " + ".join(self.columns)
+
+    def indices(self, headers):
+        """各列在表头中的位置；字段不存在时抛出 ValueError。"""
+        result = []
+        for name in self.columns:
+            try:
+                result.append(headers.index(name))
+            except ValueError:
+                raise ValueError(f"字段不存在：{name}") from None
+        return result
+
+    def make_key(self):
+        """返回 make(parts)：由各列的原始值计算规范化后的键。"""
+        funcs = [_compose(chain) for chain in self.chains]
+        if len(funcs) == 1:
+            return funcs[0]
+
+        def make(parts):
+            values = [func(value) for func, value in zip(funcs, parts)]
+            return KEY_SEP.join(values) if any(values) else ""
+
+        return make
+
+    def bind(self, headers):
+        """返回 key(row)：从一行（列表）中取出规范化后的键，列数不足时按空值处理。"""
+        indices = self.indices(headers)
+        make = self.make_key()
+
+        if len(indices) == 1:
+            index = indices[0]
+
+            def key(row):
+                return make(row[index]) if index < len(row) else make("")
+
+            return key
+
+        def key(row):
+            n = len(row)
+            return make([row[i] if i < n else "" for i in indices])
+
+        return key
+
+
+def as_key_spec(key):
+    """列名或 KeySpec 统一转换为 KeySpec（列名默认只去除首尾空格）。"""
+    return key if isinstance(key, KeySpec) else KeySpec(key)
@@ -1,6 +1,12 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import csv
+import multiprocessing
+
+import csv_join
+from csv_columnar import load_csv
+from sketches import BloomFilter
+from tk_jobs import JobRunner
 
 class CSVParserApp:
     def __init__(self, root):
@@ -10,12 +16,39 @@ class CSVParserApp:
 
         self.file_path = None
         self.headers = []
-        self.rows = []
+        self.table = None
+        self.runner = JobRunner(root)
+        self.streaming = tk.BooleanVar(value=False)
+        self.memory_mb = tk.IntVar(value=csv_join.MEMORY_BUDGET >> 20)
+        self.use_bloom = tk.BooleanVar(value=False)
+        self.parallel = tk.BooleanVar(value=True)
+        self.bloom_rate = tk.StringVar(value="0.01")
 
         # 文件选择
         self.btn_select_file = tk.Button(root, text="Select CSV File", command=self.select_file)
         self.btn_select_file.pack(pady=10)
 
+        # 流式模式：不加载到内存，结果直接写入文件；超过内存上限时改用外部排序归并
+        option_frame = tk.Frame(root)
+        option_frame.pack(pady=2)
+        tk.Checkbutton(
+            option_frame, text="Streaming mode (large files, write result directly)", variable=self.streaming
+        ).pack(side=tk.LEFT)
+        tk.Label(option_frame, text="Memory budget (MB):").pack(side=tk.LEFT, padx=(10, 2))
+        tk.Spinbox(
+            option_frame, from_=16, to=65536, increment=64, width=8, textvariable=self.memory_mb
+        ).pack(side=tk.LEFT)
+        tk.Checkbutton(option_frame, text="Parallel scan", variable=self.parallel).pack(side=tk.LEFT, padx=(10, 0))
+
+        # 布隆过滤器预筛选：Field A 的值很多时，只为"可能存在"的值保留精确集合
+        bloom_frame = tk.Frame(root)
+        bloom_frame.pack(pady=2)
+        tk.Checkbutton(
+            bloom_frame, text="Bloom filter prefilter (less memory for huge Field A)", variable=self.use_bloom
+        ).pack(side=tk.LEFT)
+        tk.Label(bloom_frame, text="False positive rate:").pack(side=tk.LEFT, padx=(10, 2))
+        tk.Entry(bloom_frame, textvariable=self.bloom_rate, width=8).pack(side=tk.LEFT)
+
         self.lbl_file = tk.Label(root, text="No file selected")
         self.lbl_file.pack(pady=5)
 
@@ -38,24 +71,50 @@ class CSVParserApp:
         self.btn_save = tk.Button(root, text="Save Result", command=self.save_result, state=tk.DISABLED)
         self.btn_save.pack(pady=5)
 
+        # 取消按钮与进度
+        self.btn_cancel = tk.Button(root, text="Cancel", command=self.runner.cancel)
+        self.btn_cancel.pack(pady=5)
+
+        self.progress = ttk.Progressbar(root, mode="determinate", length=400)
+        self.progress.pack(pady=5)
+
+        self.lbl_status = tk.Label(root, text="Ready")
+        self.lbl_status.pack(pady=5)
+
         self.result_rows = []
 
     def select_file(self):
-        self.file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
-        if self.file_path:
-            self.lbl_file.config(text=self.file_path)
-            with open(self.file_path, newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                self.headers = next(reader)
-                # 读取所有行，去掉每个单元格的前后空格和换行
-                self.rows = []
-                for row in reader:
-                    cleaned_row = [cell.strip() for cell in row]
-                    self.rows.append(dict(zip(self.headers, cleaned_row)))
-            # 更新下拉框
-            self.combo_field_a['values'] = self.headers
-            self.combo_field_b['values'] = self.headers
-            messagebox.showinfo("Info", f"CSV loaded. Fields: {', '.join(self.headers)}")
+        path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        if path:
+            self.start_job(self.read_csv_job, path, self.streaming.get(), on_done=self.on_csv_loaded)
+
+    def read_csv_job(self, job, path, headers_only=False):
+        """后台线程：读取 CSV 全部行（流式模式只读取表头）。"""
+        if headers_only:
+            with open(path, newline='', encoding='utf-8') as f:
+                return path, next(csv.reader(f)), None
+
+        # 按列读取，去掉每个单元格的前后空格和换行
+        table = load_csv(
+            path, encoding="utf-8", strip=True,
+            progress=lambda done, total: job.progress(
+                done, total, f"Loading... {done / 1048576:.1f} / {total / 1048576:.1f} MB"
+            ),
+        )
+        return path, table.headers, table
+
+    def on_csv_loaded(self, result):
+        self.file_path, self.headers, self.table = result
+        self.lbl_file.config(text=self.file_path)
+        # 按实际读取的结果判断（读取期间复选框可能已被切换）
+        if self.table is None:
+            self.set_status("Headers loaded (streaming mode)")
+        else:
+            self.set_status(f"Loaded {len(self.table)} rows")
+        # 更新下拉框
+        self.combo_field_a['values'] = self.headers
+        self.combo_field_b['values'] = self.headers
+        messagebox.showinfo("Info", f"CSV loaded. Fields: {', '.join(self.headers)}")
 
     def parse_csv(self):
         field_a = self.field_a_var.get()
@@ -68,26 +127,159 @@ class CSVParserApp:
             messagebox.showerror("Error", "Field A or Field B not selected correctly.")
             return
 
-        set_a = set(row[field_a] for row in self.rows)
-        # 筛选 B 字段中存在但 A 字段中不存在的整行
-        self.result_rows = [row for row in self.rows if row[field_b] not in set_a]
+        error_rate = None
+        if self.use_bloom.get():
+            try:
+                error_rate = float(self.bloom_rate.get())
+                if not 0 < error_rate < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "False positive rate must be between 0 and 1 (e.g. 0.01).")
+                return
+
+        if self.streaming.get():
+            self.parse_streaming(field_a, field_b, error_rate)
+            return
+        if self.table is None:
+            messagebox.showerror("Error", "Rows were not loaded. Please select the CSV file again.")
+            return
+
+        if error_rate is not None:
+            self.start_job(self.parse_bloom_job, self.table, field_a, field_b, error_rate, on_done=self.on_parsed)
+        else:
+            self.start_job(self.parse_job, self.table, field_a, field_b, on_done=self.on_parsed)
+
+    def parse_bloom_job(self, job, table, field_a, field_b, error_rate):
+        """后台线程：与 parse_job 结果相同，但不为 Field A 的全部值建立集合。
+
+        A 的值先加入布隆过滤器；B 的值不在过滤器中的一定不在 A 中，
+        只有"可能存在"的 B 值才需要用 A 的值精确核对。
+        """
+        column_a = table.column(field_a)
+        column_b = table.column(field_b)
+
+        job.progress(0, 3, "Building Bloom filter from Field A...", force=True)
+        bloom = BloomFilter(len(table), error_rate)
+        bloom.update(column_a.scan_values())
+
+        job.progress(1, 3, "Prefiltering Field B...", force=True)
+        candidates = {value for value in column_b.scan_values() if value in bloom}
+        del bloom
+
+        # 精确集合只包含候选值，误判的候选在这里被排除
+        job.progress(2, 3, "Verifying candidates...", force=True)
+        verified = {value for value in column_a.scan_values() if value in candidates}
+        del candidates
 
+        return column_b.select(lambda value: value not in verified)
+
+    def parse_job(self, job, table, field_a, field_b):
+        """后台线程：筛选 B 字段中存在但 A 字段中不存在的整行，返回行号。"""
+        job.progress(0, 2, "Collecting Field A values...", force=True)
+        set_a = table.column(field_a).distinct()
+
+        job.progress(1, 2, "Matching Field B...", force=True)
+        return table.column(field_b).select(lambda value: value not in set_a)
+
+    def parse_streaming(self, field_a, field_b, error_rate=None):
+        """流式模式：先选择输出文件，B 字段不在 A 字段中的行直接写入。"""
+        try:
+            memory_mb = self.memory_mb.get()
+        except tk.TclError:
+            memory_mb = 0
+        if memory_mb <= 0:
+            messagebox.showerror("Error", "Memory budget must be a positive number of MB.")
+            return
+
+        save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        if not save_path:
+            return
+
+        self.start_job(
+            self.parse_streaming_job, self.file_path, field_a, field_b, save_path, memory_mb << 20, error_rate,
+            self.parallel.get(),
+            on_done=self.on_streamed
+        )
+
+    def parse_streaming_job(
+        self, job, path, field_a, field_b, save_path, memory_budget, error_rate=None, parallel=False
+    ):
+        """后台线程：对同一个文件做 anti-join（B 字段作为匹配键，A 字段作为值集合）。"""
+        if error_rate is not None:
+            stats = csv_join.bloom_anti_join(
+                path, field_b, path, field_a, save_path, error_rate,
+                encoding="utf-8", progress=job.progress
+            )
+            return stats, save_path
+
+        stats = csv_join.hash_join(
+            path, field_b, path, field_a, save_path, "anti",
+            encoding="utf-8", progress=job.progress, memory_budget=memory_budget, parallel=parallel
+        )
+        return stats, save_path
+
+    def on_streamed(self, result):
+        stats, save_path = result
+        self.set_status("Done")
+        note = ""
+        if stats["build"] == "sort-merge":
+            note = "\nMemory budget exceeded: used external sort-merge (output is ordered by Field B)."
+        elif stats["build"] == "bloom":
+            note = (
+                f"\nBloom filter: {stats['filter_bytes'] / 1048576:.1f} MB, "
+                f"{stats['candidates']} candidates, {stats['candidates'] - stats['verified']} false positives"
+            )
+        messagebox.showinfo(
+            "Result",
+            f"Found {stats['kept']} of {stats['total']} records in Field B not in Field A{note}\n"
+            f"Result saved to {save_path}"
+        )
+
+    def on_parsed(self, result_rows):
+        self.result_rows = result_rows
+        self.set_status("Done")
         messagebox.showinfo("Result", f"Found {len(self.result_rows)} records in Field B not in Field A")
         self.btn_save.config(state=tk.NORMAL)
 
+    # 后台任务
+    def start_job(self, func, *args, on_done):
+        def on_error(e):
+            self.set_status("Error")
+            messagebox.showerror("Error", str(e))
+
+        started = self.runner.start(
+            func, *args,
+            on_done=on_done,
+            on_error=on_error,
+            on_progress=self.show_progress,
+            on_cancel=lambda: self.set_status("Cancelled"),
+        )
+        if not started:
+            messagebox.showinfo("Info", "A task is already running. Please wait or cancel it first.")
+            return
+        self.set_status("Working...")
+
+    def show_progress(self, done, total, text):
+        if total:
+            self.progress.config(maximum=total, value=done)
+        self.lbl_status.config(text=text or f"{done} rows")
+
+    def set_status(self, text):
+        self.progress.config(value=0)
+        self.lbl_status.config(text=text)
+
     def save_result(self):
         if not self.result_rows:
             messagebox.showerror("Error", "No result to save.")
             return
         save_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
         if save_path:
-            with open(save_path, "w", newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.headers)
-                writer.writeheader()
-                writer.writerows(self.result_rows)
+            self.table.write_csv(save_path, self.result_rows, encoding='utf-8')
             messagebox.showinfo("Saved", f"Result saved to {save_path}")
 
 if __name__ == "__main__":
+    # pyinstaller 打包后使用进程池需要
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = CSVParserApp(root)
     root.mainloop()
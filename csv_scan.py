@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""CSV 多进程并行扫描（只读）
+
+单线程 csv.reader 的速度远低于磁盘读取速度。这里把文件用 mmap 映射后切分为
+若干分块，交给进程池并行解析，最后合并每个分块的结果：
+
+- scan_keys：收集某个匹配键的非空值（合并各分块的集合）
+- scan_filter：按键集合过滤行，各分块的输出按原始顺序写入结果文件
+
+切分时按引号的奇偶性判断换行符是否在带引号的字段内：从记录边界开始数到某个
+换行符，引号个数为偶数时该换行符才是记录的结尾（转义的 "" 成对出现，不影响奇偶性）。
+
+分块在换行处切分，所以只支持 utf-8 等与 ASCII 兼容的编码。
+
+每个子进程都需要一份键集合。设置了 memory_budget 且各进程的副本合计超过它时，
+子进程只拿到键集合的布隆过滤器（每个键约 1.2 字节），用来预筛选；
+可能误判的键由主进程用完整的集合确认，结果与直接使用集合相同。
+"""
+
+import csv
+import io
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from csv_keys import as_key_spec
+from sketches import BloomFilter
+
+# 小于这个大小的文件单进程读取更快（省去启动进程和传输结果的开销）
+PARALLEL_MIN_SIZE = 16 << 20
+
+# 每个分块的最大大小
+CHUNK_SIZE = 32 << 20
+
+# 统计引号个数时每次复制的大小
+_COUNT_BLOCK = 1 << 20
+
+# 集合中每个条目除字符串本身以外的大致开销（字节），与 csv_join 的估算方式相同
+_ENTRY_OVERHEAD = 80
+
+
+def _count_quotes(mm, start, end):
+    count = 0
+    for pos in range(start, end, _COUNT_BLOCK):
+        count += mm[pos:min(pos + _COUNT_BLOCK, end)].count(b'"')
+    return count
+
+
+def _record_end(mm, start, target):
+    """从记录边界 start 出发，返回 target 之后第一个不在引号内的换行符的下一个位置。"""
+    size = len(mm)
+    quotes = _count_quotes(mm, start, target)
+    pos = target
+    while True:
+        newline = mm.find(b"\n", pos)
+        if newline == -1:
+            return size
+        quotes += _count_quotes(mm, pos, newline)
+        if quotes % 2 == 0:
+            return newline + 1
+        pos = newline + 1
+
+
+def split_csv_chunks(mm, chunk_size=CHUNK_SIZE):
+    """返回 (表头结束位置, [(start, end), ...])，每个分块都由完整的记录组成。"""
+    size = len(mm)
+    header_end = _record_end(mm, 0, 0)
+    chunks = []
+    start = header_end
+    while start < size:
+        target = start + chunk_size
+        end = size if target >= size else _record_end(mm, start, target)
+        chunks.append((start, end))
+        start = end
+    return header_end, chunks
+
+
+def _chunk_encoding(encoding):
+    # BOM 只出现在文件开头（表头中），分块按普通 utf-8 解码
+    return "utf-8" if encoding == "utf-8-sig" else encoding
+
+
+# ----------------- 子进程 -----------------
+
+_worker = {}
+
+
+def _init_worker(path, headers, key, encoding, keys):
+    with open(path, "rb") as f:
+        _worker["mm"] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker["get_key"] = as_key_spec(key).bind(headers)
+    _worker["encoding"] = _chunk_encoding(encoding)
+    _worker["keys"] = keys
+    # 布隆过滤器中的键可能是误判，需要主进程确认
+    _worker["exact"] = not isinstance(keys, BloomFilter)
+
+
+def _chunk_rows(start, end):
+    text = _worker["mm"][start:end].decode(_worker["encoding"])
+    return csv.reader(io.StringIO(text, newline=""))
+
+
+def _scan_keys_chunk(start, end):
+    """子进程：分块中的非空键；设置了 keys 时只保留其中的键（布隆过滤器时可能多出误判的键）。"""
+    get_key = _worker["get_key"]
+    within = _worker["keys"]
+    result = set()
+    for row in _chunk_rows(start, end):
+        key = get_key(row)
+        if key and (within is None or key in within):
+            result.add(key)
+    return result
+
+
+def _scan_filter_chunk(start, end, anti):
+    """子进程：过滤分块中的行，返回 (行数, 确定保留的行数, 输出片段列表)。
+
+    片段为确定保留的连续行的 CSV 文本，或 (键, 行的 CSV 文本)：
+    键在布隆过滤器中、需要主进程确认的行。
+    """
+    get_key = _worker["get_key"]
+    keys = _worker["keys"]
+    exact = _worker["exact"]
+    out = io.StringIO(newline="")
+    writer = csv.writer(out)
+    line = io.StringIO(newline="")
+    line_writer = csv.writer(line)
+    parts = []
+    total = kept = 0
+    for row in _chunk_rows(start, end):
+        total += 1
+        key = get_key(row)
+        if key not in keys:
+            if anti:
+                writer.writerow(row)
+                kept += 1
+        elif exact:
+            if not anti:
+                writer.writerow(row)
+                kept += 1
+        else:
+            if out.tell():
+                parts.append(out.getvalue())
+                out.seek(0)
+                out.truncate()
+            line_writer.writerow(row)
+            parts.append((key, line.getvalue()))
+            line.seek(0)
+            line.truncate()
+    if out.tell():
+        parts.append(out.getvalue())
+    return total, kept, parts
+
+
+# ----------------- 主进程 -----------------
+
+def _layout(path, encoding, max_workers, chunk_size):
+    """读取表头并切分数据区，返回 (表头, 分块列表, 进程数)。"""
+    size = os.path.getsize(path)
+    if not size:
+        raise ValueError("CSV 文件为空或没有表头")
+    workers = max_workers or os.cpu_count() or 1
+    # 切得比进程数更细，便于负载均衡和显示进度
+    chunk_size = chunk_size or max(1 << 20, min(CHUNK_SIZE, size // (workers * 4) + 1))
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end, chunks = split_csv_chunks(mm, chunk_size)
+            header = mm[:header_end].decode(encoding)
+    headers = next(csv.reader(io.StringIO(header, newline="")), [])
+    return headers, chunks, workers
+
+
+def _worker_keys(keys, workers, memory_budget):
+    """交给子进程的键集合：各进程的副本合计超过 memory_budget 时改为布隆过滤器。"""
+    if keys is None or not memory_budget:
+        return keys
+    size = sum(map(sys.getsizeof, keys)) + _ENTRY_OVERHEAD * len(keys)
+    if size * workers <= memory_budget:
+        return keys
+    bloom = BloomFilter(len(keys))
+    bloom.update(keys)
+    return bloom
+
+
+def _run_chunks(path, layout, key, encoding, keys, task, args, progress, memory_budget=None):
+    """在进程池中对每个分块运行 task，按分块顺序产出结果。"""
+    headers, chunks, workers = layout
+    # 在主进程中检查字段是否存在
+    as_key_spec(key).bind(headers)
+    if not chunks:
+        return
+
+    workers = min(workers, len(chunks))
+    keys = _worker_keys(keys, workers, memory_budget)
+    size = os.path.getsize(path)
+    done = 0
+    results = {}
+    next_index = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(path, headers, key, encoding, keys),
+    ) as pool:
+        futures = {
+            pool.submit(task, start, end, *args): (i, end - start)
+            for i, (start, end) in enumerate(chunks)
+        }
+        try:
+            for future in as_completed(futures):
+                index, length = futures[future]
+                results[index] = future.result()
+                done += length
+                if progress:
+                    progress(done, size)
+                # 按原始顺序交出已完成的分块
+                while next_index in results:
+                    yield results.pop(next_index)
+                    next_index += 1
+        except BaseException:
+            # 出错或被取消时不再等待尚未开始的分块
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def scan_keys(
+    path, key, encoding="utf-8-sig", within=None, progress=None,
+    max_workers=None, chunk_size=None, memory_budget=None,
+):
+    """并行收集匹配键（列名或 KeySpec）的非空值；within 不为 None 时只保留其中的键。"""
+    layout = _layout(path, encoding, max_workers, chunk_size)
+    keys = set()
+    for chunk_keys in _run_chunks(
+        path, layout, key, encoding, within, _scan_keys_chunk, (), progress, memory_budget
+    ):
+        if within is not None:
+            # 子进程可能只有布隆过滤器，去掉误判的键
+            chunk_keys &= within
+        keys |= chunk_keys
+    return keys
+
+
+def scan_filter(
+    path, key, keys, out_path, anti=False, encoding="utf-8-sig",
+    progress=None, max_workers=None, chunk_size=None, memory_budget=None,
+):
+    """并行过滤：键在 keys 中的行（anti=True 时为不在其中的行）按原始顺序写入 out_path。
+
+    与 csv_join.semi_join 的结果相同，返回 (总行数, 保留行数)。
+    """
+    layout = _layout(path, encoding, max_workers, chunk_size)
+    total = kept = 0
+    with open(out_path, "w", newline="", encoding=encoding) as out:
+        writer = csv.writer(out)
+        writer.writerow(layout[0])
+        for chunk_total, chunk_kept, parts in _run_chunks(
+            path, layout, key, encoding, keys, _scan_filter_chunk, (anti,), progress, memory_budget
+        ):
+            total += chunk_total
+            kept += chunk_kept
+            for part in parts:
+                if isinstance(part, str):
+                    out.write(part)
+                elif (part[0] in keys) != anti:
+                    out.write(part[1])
+                    kept += 1
+    return total, kept
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""近似匹配：n-gram 倒排索引 + 编辑距离
+
+对 B 的每个不同值建立 n-gram（默认三元组）倒排索引。查询 A 的值时：
+1. 通过倒排索引统计与 A 共享 n-gram 的 B 值，按共享个数取前 shortlist 个候选
+2. 只对候选计算编辑距离相似度（Damerau/OSA：相邻字符交换算一次编辑，
+   适合电话号码中两位数字写反的情况）
+
+不需要把每个 A 值和每个 B 值逐一比较。
+出现在太多 B 值中的 n-gram（如常见前缀）区分度低，查询时跳过；
+所有 n-gram 都很常见时（如纯数字的编号、电话号码）只扫描有限个编号，
+查询代价不随 B 的大小增长。
+"""
+
+import heapq
+from array import array
+from collections import Counter
+
+
+def ngrams(text, n=3):
+    """文本的 n-gram 集合，首尾补空格，使短文本和开头/结尾的字符也有 n-gram。"""
+    padded = " " * (n - 1) + text + " " * (n - 1)
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def osa_distance(a, b):
+    """编辑距离（插入、删除、替换、相邻交换各算一次）。"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = ca != cb
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, prev2[j - 2] + 1)
+            cur[j] = value
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def similarity(a, b):
+    """1 - 编辑距离 / 较长字符串的长度，范围 0~1。"""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    return 1.0 - osa_distance(a, b) / longest
+
+
+class NgramIndex:
+    """B 值的 n-gram 倒排索引。"""
+
+    def __init__(self, values, n=3, max_postings=10000, max_scan=None):
+        self.n = n
+        self.max_postings = max_postings
+        # 没有区分度高的 n-gram 时，一次查询最多扫描的编号个数
+        self.max_scan = max_scan if max_scan is not None else max_postings * 5
+        self.values = list(values)
+        self.exact = {value: i for i, value in enumerate(self.values)}
+        postings = {}
+        for i, value in enumerate(self.values):
+            for gram in ngrams(value, n):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I")
+                posting.append(i)
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.values)
+
+    def candidates(self, text, shortlist=20):
+        """共享 n-gram 最多的前 shortlist 个 B 值的编号。
+
+        只使用区分度高的 n-gram（出现在不超过 max_postings 个 B 值中）。都很常见时
+        从最短的倒排列表开始使用，扫描的编号总数不超过 max_scan；
+        最短的列表也超过时没有候选（视为没有近似值）。
+        """
+        grams = [self.postings.get(g) for g in ngrams(text, self.n)]
+        grams = [p for p in grams if p is not None]
+        selective = [p for p in grams if len(p) <= self.max_postings]
+        if not selective:
+            scanned = 0
+            for posting in sorted(grams, key=len):
+                scanned += len(posting)
+                if scanned > self.max_scan:
+                    break
+                selective.append(posting)
+        counts = Counter()
+        for posting in selective:
+            counts.update(posting)
+        return [i for i, _ in heapq.nlargest(shortlist, counts.items(), key=lambda kv: kv[1])]
+
+    def best_match(self, text, threshold=0.8, shortlist=20):
+        """返回 (最相似的 B 值, 相似度)；相似度低于 threshold 时返回 None。"""
+        i = self.exact.get(text)
+        if i is not None:
+            return self.values[i], 1.0
+
+        best = None
+        best_score = threshold
+        length = len(text)
+        for i in self.candidates(text, shortlist):
+            value = self.values[i]
+            # 长度相差太大时相似度不可能达到阈值
+            if 1.0 - abs(len(value) - length) / max(len(value), length, 1) < best_score:
+                continue
+            score = similarity(text, value)
+            if score >= best_score:
+                best, best_score = value, score
+        if best is None:
+            return None
+        return best, best_score
@@ -2,11 +2,426 @@
 # -*- coding: utf-8 -*-
 
 import json
+import multiprocessing
 import os
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice, product
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+from colfile import ColumnFile, is_colfile
+from json_path import compile_path, list_paths, parse_path
+from json_stream import (
+    ParsedFileCache,
+    is_json_lines,
+    iter_json_array,
+    iter_json_lines,
+    read_first_item,
+    split_line_ranges,
+)
+from sketches import TopKSketch
+from tk_jobs import JobRunner
+
+
+# 区分“没有元素”与元素本身为 null
+_EMPTY = object()
+
+# 缺失或空值归入的虚拟分组
+OTHER = "other"
+
+# JSON Lines 文件超过该大小时使用多进程并行统计
+PARALLEL_MIN_SIZE = 16 << 20
+# 每个进程一次处理的字节数
+PARALLEL_CHUNK_SIZE = 32 << 20
+
+# 近似模式下每个 Top-K 输出值对应的跟踪容量（容量越大计数越准）
+SKETCH_CAPACITY_FACTOR = 10
+
+# 不超过该大小的文件，解析后的全部元素会被缓存，换字段统计时无需重新解析。
+# 解析后的对象比文件大得多，所以只缓存最近统计的一个文件的元素
+ITEMS_CACHE_MAX_SIZE = 32 << 20
+
+# 读取 .col 文件时每多少行报告一次进度
+COLFILE_BLOCK_ROWS = 1 << 16
+
+# 报告中的交叉表最多显示的行值/列值个数（按数量取前 N 个，其余合并到 other）
+CROSSTAB_TOP = 30
+
+
+def _normalize_value(value):
+    """字符串去除前后空格，空值返回 OTHER；数组/对象转为 JSON 文本以便计数。"""
+    if isinstance(value, str):
+        value = value.strip()
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    if value is None or value == "":
+        return OTHER
+    return value
+
+
+def _field_values(accessor, item):
+    """用编译好的路径取出字段值列表，缺失时为 [OTHER]。"""
+    values = [_normalize_value(v) for v in accessor(item)]
+    return values or [OTHER]
+
+
+def _sort_values(values):
+    """按值 a-z 排序，other 始终放最后；类型混杂时按字符串比较。"""
+    values = [v for v in values if v != OTHER]
+    try:
+        values.sort()
+    except TypeError:
+        values.sort(key=str)
+    return values
+
+
+class FieldCounter:
+    """单次遍历同时统计多个字段。
+
+    - combined：多个字段值组成的组合键计数，如 (department, status)；
+      只有一个字段时不单独计数，combined 就是该字段的计数（键为值本身而不是元组）
+    - marginals：每个字段各自的计数
+
+    字段可以是嵌套路径（见 json_path），路径在构造时编译一次。
+    含 [*] 的路径一条记录可能产生多个值，组合键取各字段值的笛卡尔积。
+
+    approx_top 不为空时使用近似模式：计数改用固定内存的 TopKSketch
+    （Space-Saving + HyperLogLog），只保留前 approx_top 个值的近似计数和不同值个数。
+    """
+
+    def __init__(self, fields, approx_top=None):
+        self.fields = list(fields)
+        self.accessors = [compile_path(f) for f in self.fields]
+        self.approx_top = approx_top
+        single = len(self.fields) == 1
+        if approx_top:
+            capacity = max(approx_top * SKETCH_CAPACITY_FACTOR, 1000)
+            self._combined = None if single else TopKSketch(capacity)
+            self.marginals = [TopKSketch(capacity) for _ in self.fields]
+        else:
+            self._combined = None if single else Counter()
+            self.marginals = [Counter() for _ in self.fields]
+        # 单个顶层字段（最常见的情况）直接用 dict.get 取值
+        steps = parse_path(self.fields[0]) if single else None
+        self._top_key = steps[0][1] if steps and len(steps) == 1 and steps[0][0] == "key" else None
+        self.total = 0
+
+    @property
+    def combined(self):
+        return self.marginals[0] if self._combined is None else self._combined
+
+    def add(self, item):
+        if self._combined is None:
+            self._add_single(item)
+            return
+        if self.approx_top:
+            self._add_approx(item)
+            return
+
+        key = []
+        fan_out = False
+        for accessor, marginal in zip(self.accessors, self.marginals):
+            values = _field_values(accessor, item)
+            if len(values) == 1:
+                value = values[0]
+                marginal[value] += 1
+                key.append(value)
+            else:
+                marginal.update(values)
+                key.append(values)
+                fan_out = True
+
+        if fan_out:
+            # 含 [*] 的字段有多个值，组合键取笛卡尔积
+            parts = [v if isinstance(v, list) else [v] for v in key]
+            self.combined.update(product(*parts))
+        else:
+            self.combined[tuple(key)] += 1
+        self.total += 1
+
+    def _add_single(self, item):
+        marginal = self.marginals[0]
+        self.total += 1
+        if self._top_key is not None:
+            value = item.get(self._top_key) if isinstance(item, dict) else None
+            # 与 _normalize_value 相同，字符串（最常见）直接处理
+            value = (value.strip() or OTHER) if type(value) is str else _normalize_value(value)
+            if self.approx_top:
+                marginal.add(value)
+            else:
+                marginal[value] += 1
+            return
+        values = _field_values(self.accessors[0], item)
+        if self.approx_top:
+            marginal.update(values)
+        elif len(values) == 1:
+            marginal[values[0]] += 1
+        else:
+            marginal.update(values)
+
+    def _add_approx(self, item):
+        parts = []
+        for accessor, sketch in zip(self.accessors, self.marginals):
+            values = _field_values(accessor, item)
+            sketch.update(values)
+            parts.append(values)
+        self.combined.update(product(*parts))
+        self.total += 1
+
+    def merge(self, other):
+        """合并另一个计数器的结果（字段和模式必须相同）。"""
+        if self.approx_top:
+            if self._combined is not None:
+                self._combined.merge(other._combined)
+            for sketch, other_sketch in zip(self.marginals, other.marginals):
+                sketch.merge(other_sketch)
+        else:
+            if self._combined is not None:
+                self._combined.update(other._combined)
+            for marginal, other_marginal in zip(self.marginals, other.marginals):
+                marginal.update(other_marginal)
+        self.total += other.total
+
+    # 编译好的访问函数是闭包，不能跨进程传递，反序列化时重新编译
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["accessors"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.accessors = [compile_path(f) for f in self.fields]
+
+    def sorted_items(self, counter):
+        """按 key 排序输出 (key, 数量)，other 放最后。"""
+        keys = _sort_values(counter)
+        items = [(k, counter[k]) for k in keys]
+        if OTHER in counter:
+            items.append((OTHER, counter[OTHER]))
+        return items
+
+    def crosstab(self, row_index=0, col_index=1, top=None):
+        """交叉表：返回 (行值列表, 列值列表, {(行值, 列值): 数量})。
+
+        top 不为空时行值、列值各只保留数量最多的 top 个，其余的值合并到 other。
+        """
+        table = Counter()
+        for key, cnt in self.combined.items():
+            table[(key[row_index], key[col_index])] += cnt
+
+        if top:
+            row_totals = Counter()
+            col_totals = Counter()
+            for (r, c), cnt in table.items():
+                row_totals[r] += cnt
+                col_totals[c] += cnt
+            if len(row_totals) > top or len(col_totals) > top:
+                keep_rows = {r for r, _ in row_totals.most_common(top)}
+                keep_cols = {c for c, _ in col_totals.most_common(top)}
+                folded = Counter()
+                for (r, c), cnt in table.items():
+                    folded[(r if r in keep_rows else OTHER, c if c in keep_cols else OTHER)] += cnt
+                table = folded
+
+        def ordered(values):
+            result = _sort_values(values)
+            if OTHER in values:
+                result.append(OTHER)
+            return result
+
+        rows = ordered({r for r, _ in table})
+        cols = ordered({c for _, c in table})
+        return rows, cols, table
+
+
+def _count_line_range(path, start, end, fields, approx_top):
+    """子进程：统计 JSON Lines 文件 [start, end) 区间内的记录。"""
+    engine = FieldCounter(fields, approx_top)
+    for item in iter_json_lines(path, start, end):
+        engine.add(item)
+    return engine
+
+
+def count_json_lines_parallel(path, fields, approx_top=None, progress=None, max_workers=None):
+    """按换行切分 JSON Lines 文件，交给进程池并行统计后合并结果。"""
+    total = os.path.getsize(path)
+    workers = max_workers or os.cpu_count() or 1
+    # 切得比进程数更细，便于负载均衡和显示进度
+    chunk_size = max(1 << 20, min(PARALLEL_CHUNK_SIZE, total // (workers * 4) + 1))
+    ranges = split_line_ranges(path, chunk_size)
+
+    engine = FieldCounter(fields, approx_top)
+    done = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)) or 1) as pool:
+        futures = {
+            pool.submit(_count_line_range, path, start, end, engine.fields, approx_top): end - start
+            for start, end in ranges
+        }
+        try:
+            for future in as_completed(futures):
+                engine.merge(future.result())
+                done += futures[future]
+                if progress:
+                    progress(done, total)
+        except BaseException:
+            # 出错或被取消时不再等待尚未开始的分块
+            for future in futures:
+                future.cancel()
+            raise
+    return engine
+
+
+def count_colfile(path, fields, approx_top=None, progress=None):
+    """统计列式文件（.col，见 colfile.py）：只读取统计字段对应的列，不需要解析文本。
+
+    .col 中的值都是标量，嵌套路径取不到值，归入 other。
+    """
+    engine = FieldCounter(fields, approx_top)
+    with ColumnFile(path) as cf:
+        names = [name for name in dict.fromkeys(fields) if name in cf.names]
+        items = cf.iter_dicts(names)
+        for start in range(0, cf.rows, COLFILE_BLOCK_ROWS):
+            if progress:
+                progress(start, cf.rows, f"正在统计... {start} / {cf.rows} 行")
+            for item in islice(items, COLFILE_BLOCK_ROWS):
+                engine.add(item)
+    return engine
+
+
+def _value_sort_key(value):
+    """按值排序的 key：other 放最后，数字按大小，其他按字符串；组合键逐项比较。"""
+    if isinstance(value, tuple):
+        return tuple(_value_sort_key(v) for v in value)
+    if value == OTHER:
+        return (2, 0, "")
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+def _format_value(value):
+    if isinstance(value, tuple):
+        return " | ".join(str(v) for v in value)
+    return str(value)
+
+
+class VirtualTable(ttk.Frame):
+    """虚拟化表格：数据保存在普通列表中，Treeview 只创建可见的行。
+
+    滚动时复用已有的行并替换其中的值，排序只对列表排序后刷新可见行，
+    几十万行数据也不需要向控件插入同样数量的条目。
+    """
+
+    def __init__(self, master, height=15):
+        super().__init__(master)
+        self.rows = []
+        self.columns = []
+        self.offset = 0
+        self._visible = height
+        self._sort_column = None
+        self._sort_reverse = False
+
+        self.tree = ttk.Treeview(self, show="headings", height=height, selectmode="browse")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        self.scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scroll.grid(row=0, column=1, sticky="ns")
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", self._on_wheel)
+        self.tree.bind("<Button-5>", self._on_wheel)
+        self.tree.bind("<Prior>", lambda e: self._scroll_to(self.offset - self._visible))
+        self.tree.bind("<Next>", lambda e: self._scroll_to(self.offset + self._visible))
+        self.tree.bind("<Home>", lambda e: self._scroll_to(0))
+        self.tree.bind("<End>", lambda e: self._scroll_to(len(self.rows)))
+
+    def set_data(self, columns, rows):
+        """columns: [(标题, 宽度, 对齐, 排序 key 函数, 格式化函数), ...]；rows: 元组列表。"""
+        self.columns = columns
+        self.rows = rows
+        self.offset = 0
+        self._sort_column = None
+        self._sort_reverse = False
+
+        ids = [f"c{i}" for i in range(len(columns))]
+        self.tree.delete(*self.tree.get_children())
+        self.tree.config(columns=ids)
+        for i, (title, width, anchor, _, _) in enumerate(columns):
+            self.tree.heading(ids[i], text=title, command=lambda c=i: self.sort_by(c))
+            self.tree.column(ids[i], width=width, anchor=anchor, stretch=(i == 0))
+        self._refresh()
+
+    def sort_by(self, column):
+        """按列排序；再次点击同一列时反向。数量列第一次点击按从大到小排序。"""
+        if self._sort_column == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_column = column
+            self._sort_reverse = column > 0
+
+        key = self.columns[column][3]
+        self.rows.sort(key=lambda row: key(row[column]), reverse=self._sort_reverse)
+
+        for i, (title, *_rest) in enumerate(self.columns):
+            mark = ""
+            if i == column:
+                mark = " ▼" if self._sort_reverse else " ▲"
+            self.tree.heading(f"c{i}", text=title + mark)
+        self._scroll_to(0)
+
+    def _on_resize(self, event):
+        rowheight = int(ttk.Style(self).lookup("Treeview", "rowheight") or 20)
+        # 去掉表头占用的一行
+        visible = max(1, event.height // rowheight - 1)
+        if visible != self._visible:
+            self._visible = visible
+            self._refresh()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self.offset - 3)
+        else:
+            self._scroll_to(self.offset + 3)
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.rows)))
+        elif unit == "pages":
+            self._scroll_to(self.offset + int(amount) * self._visible)
+        else:
+            self._scroll_to(self.offset + int(amount))
+
+    def _scroll_to(self, offset):
+        self.offset = max(0, min(offset, len(self.rows) - self._visible))
+        self._refresh()
+        return "break"
+
+    def _refresh(self):
+        """只更新可见的行：行数不变时只替换值，不增删 Treeview 条目。"""
+        count = max(0, min(self._visible, len(self.rows) - self.offset))
+        items = self.tree.get_children()
+        if len(items) > count:
+            self.tree.delete(*items[count:])
+        for _ in range(count - len(items)):
+            self.tree.insert("", tk.END)
+        items = self.tree.get_children()
+
+        formatters = [c[4] for c in self.columns]
+        for iid, row in zip(items, self.rows[self.offset:self.offset + count]):
+            self.tree.item(iid, values=[fmt(v) for fmt, v in zip(formatters, row)])
+
+        total = len(self.rows)
+        if total:
+            self.scroll.set(self.offset / total, (self.offset + count) / total)
+        else:
+            self.scroll.set(0, 1)
+
 
 class JsonFieldCounterApp(tk.Tk):
     def __init__(self):
@@ -17,9 +432,17 @@ class JsonFieldCounterApp(tk.Tk):
 
         self.json_path = tk.StringVar()
         self.field_name = tk.StringVar()
+        self.approx_var = tk.BooleanVar(value=False)
+        self.top_k_var = tk.IntVar(value=100)
         self.status_var = tk.StringVar(value="就绪")
         self.count_result = ""  # 保存结果字符串，方便导出
+        self.sections = []  # 结果表格的各部分：[(标题, 列定义, 行列表), ...]
+        self.section_var = tk.StringVar()
+        self.summary_var = tk.StringVar()
         self.available_fields_var = tk.StringVar(value="（尚未选择文件）")
+        # 字段提示与统计共用的解析缓存
+        self.cache = ParsedFileCache()
+        self.runner = JobRunner(self)
 
         self._build_ui()
 
@@ -55,16 +478,30 @@ class JsonFieldCounterApp(tk.Tk):
         lbl_field = ttk.Label(frm, text="统计字段名：")
         lbl_field.grid(row=2, column=0, sticky="w", pady=(8, 4))
 
-        entry_field = ttk.Entry(frm, textvariable=self.field_name, width=20)
+        entry_field = ttk.Entry(frm, textvariable=self.field_name, width=40)
         entry_field.grid(row=2, column=1, sticky="w", pady=(8, 4))
 
+        # 近似模式：高基数字段（email、id 等）使用固定内存统计
+        frm_approx = ttk.Frame(frm)
+        frm_approx.grid(row=2, column=2, sticky="e", pady=(8, 4))
+        ttk.Checkbutton(frm_approx, text="近似模式 Top", variable=self.approx_var).pack(side=tk.LEFT)
+        ttk.Spinbox(frm_approx, from_=10, to=10000, increment=10, width=6, textvariable=self.top_k_var).pack(
+            side=tk.LEFT
+        )
+
         # 说明
         lbl_info = ttk.Label(
             frm,
             text=(
-                "说明：JSON 须为数组结构，如 [ {\"name\":\"ali\",\"age\":18}, ... ]。\n"
+                "说明：JSON 须为数组结构，如 [ {\"name\":\"ali\",\"age\":18}, ... ]，"
+                "或 JSON Lines（.jsonl/.ndjson，每行一个对象，大文件会多进程并行统计）。\n"
                 "从第一个元素中读取字段名用于提示。统计时，字符串会自动去除前后空格，"
-                "缺失或空值会归入虚拟分组 other。统计结果按字段名 a-z 排序，other 始终放最后。"
+                "缺失或空值会归入虚拟分组 other。统计结果按字段名 a-z 排序，other 始终放最后。\n"
+                "多个字段用逗号分隔（如 department, status），一次遍历即可得到组合统计、"
+                "各字段统计以及前两个字段的交叉表。\n"
+                "支持嵌套路径：address.city、tags[*]（数组所有元素）、items[0].price。\n"
+                "近似模式适合 email、id 等高基数字段：内存固定，只输出前 N 个值的近似计数"
+                "（带误差上限）和不同值个数的估计。"
             ),
             foreground="#444",
             wraplength=700,
@@ -73,22 +510,35 @@ class JsonFieldCounterApp(tk.Tk):
         lbl_info.grid(row=3, column=0, columnspan=3, sticky="w", pady=(4, 8))
 
         # 按钮
-        btn_count = ttk.Button(frm, text="统计", command=self.do_count)
-        btn_count.grid(row=4, column=0, sticky="w", pady=(4, 4))
+        frm_buttons = ttk.Frame(frm)
+        frm_buttons.grid(row=4, column=0, sticky="w", pady=(4, 4))
+
+        btn_count = ttk.Button(frm_buttons, text="统计", command=self.do_count)
+        btn_count.pack(side=tk.LEFT)
+
+        btn_cancel = ttk.Button(frm_buttons, text="取消", command=self.runner.cancel)
+        btn_cancel.pack(side=tk.LEFT, padx=(5, 0))
+
+        # 进度条（按已读取的字节数显示）
+        self.progress = ttk.Progressbar(frm, orient=tk.HORIZONTAL, mode="determinate")
+        self.progress.grid(row=4, column=1, sticky="we", padx=(0, 5), pady=(4, 4))
 
         btn_save = ttk.Button(frm, text="保存结果到文件", command=self.save_result)
         btn_save.grid(row=4, column=2, sticky="e", pady=(4, 4))
 
-        # 结果区域
+        # 结果区域：按字段（或组合）切换，点击表头排序
         lbl_result = ttk.Label(frm, text="统计结果：")
-        lbl_result.grid(row=5, column=0, columnspan=3, sticky="w", pady=(8, 0))
+        lbl_result.grid(row=5, column=0, sticky="w", pady=(8, 0))
 
-        self.text_result = tk.Text(frm, height=15, width=90)
-        self.text_result.grid(row=6, column=0, columnspan=3, sticky="nsew", pady=(4, 0))
+        self.combo_section = ttk.Combobox(frm, textvariable=self.section_var, state="readonly", width=40)
+        self.combo_section.grid(row=5, column=1, sticky="w", pady=(8, 0))
+        self.combo_section.bind("<<ComboboxSelected>>", lambda e: self._show_section())
 
-        scroll = ttk.Scrollbar(frm, orient=tk.VERTICAL, command=self.text_result.yview)
-        scroll.grid(row=6, column=3, sticky="nsw")
-        self.text_result.config(yscrollcommand=scroll.set)
+        lbl_summary = ttk.Label(frm, textvariable=self.summary_var, foreground="#444")
+        lbl_summary.grid(row=5, column=2, sticky="e", pady=(8, 0))
+
+        self.table = VirtualTable(frm)
+        self.table.grid(row=6, column=0, columnspan=3, sticky="nsew", pady=(4, 0))
 
         # 状态栏
         status = ttk.Label(self, textvariable=self.status_var, relief=tk.SUNKEN, anchor="w")
@@ -102,7 +552,12 @@ class JsonFieldCounterApp(tk.Tk):
     def browse_file(self):
         path = filedialog.askopenfilename(
             title="选择 JSON 文件",
-            filetypes=[("JSON 文件", "*.json"), ("所有文件", "*.*")],
+            filetypes=[
+                ("JSON 文件", "*.json *.jsonl *.ndjson"),
+                ("JSON Lines", "*.jsonl *.ndjson"),
+                ("列式文件", "*.col"),
+                ("所有文件", "*.*"),
+            ],
         )
         if path:
             self.json_path.set(path)
@@ -110,122 +565,271 @@ class JsonFieldCounterApp(tk.Tk):
             # 选择文件后立即尝试加载字段名
             self._update_available_fields(path)
 
-    def _load_json_list(self, path):
-        """加载 JSON 文件，确保是 list 结构。"""
+    def _iter_json_items(self, path, progress=None):
+        """逐个读取 JSON 数组（或 JSON Lines）中的元素，不把整个文件加载到内存。"""
         if not os.path.exists(path):
             raise ValueError("文件不存在")
 
-        with open(path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"JSON 解析失败: {e}")
-
-        if not isinstance(data, list):
-            raise ValueError("JSON 根结构必须是数组 (list)")
-
-        return data
+        if is_json_lines(path):
+            return iter_json_lines(path, progress=progress)
+        return iter_json_array(path, progress=progress)
+
+    def _show_progress(self, offset, total, text=None):
+        """更新进度条，显示已读取的字节数。"""
+        # total 为 None 时（如“正在生成报告”）只更新文字
+        if total is not None:
+            self.progress.config(maximum=max(total, 1), value=offset)
+        if text:
+            self.status_var.set(text)
+        elif total is None:
+            self.status_var.set(f"正在统计... {offset / 1048576:.1f} MB")
+        else:
+            self.status_var.set(f"正在统计... {offset / 1048576:.1f} / {total / 1048576:.1f} MB")
 
     def _update_available_fields(self, path):
         """从 JSON 的第一个元素中读取字段名，并更新到 label。"""
+        if is_colfile(path):
+            # 列式文件的表头中就有列名
+            try:
+                with ColumnFile(path) as cf:
+                    names = cf.names
+            except (OSError, ValueError) as e:
+                self.available_fields_var.set(f"解析失败：{e}")
+                return
+            self.available_fields_var.set(", ".join(names) if names else "文件中没有任何字段")
+            return
+
         try:
-            data_list = self._load_json_list(path)
+            first = self.cache.get(path, "first", _EMPTY)
+            if first is _EMPTY:
+                # 只解析第一个元素，大文件也能立即显示字段名
+                first = read_first_item(path, _EMPTY)
+                self.cache.set(path, "first", first)
         except Exception as e:
             self.available_fields_var.set(f"解析失败：{e}")
             return
 
-        if not data_list:
+        if first is _EMPTY:
             self.available_fields_var.set("文件中没有任何元素")
             return
 
-        first = data_list[0]
         if not isinstance(first, dict):
             self.available_fields_var.set("第一个元素不是对象（不是 {} 结构），无法读取字段名")
             return
 
-        keys = list(first.keys())
+        keys = list_paths(first)
         if not keys:
             self.available_fields_var.set("第一个元素没有字段")
             return
 
-        self.available_fields_var.set(", ".join(str(k) for k in keys))
+        self.available_fields_var.set(", ".join(keys))
 
     def do_count(self):
         path = self.json_path.get().strip()
-        field = self.field_name.get().strip()
+        fields = [f.strip() for f in self.field_name.get().split(",") if f.strip()]
 
         if not path:
             messagebox.showwarning("提示", "请先选择 JSON 文件")
             return
-        if not field:
+        if not fields:
             messagebox.showwarning("提示", "请输入要统计的字段名")
             return
 
         try:
-            self.status_var.set("正在加载 JSON 数据...")
-            self.update_idletasks()
-
-            data_list = self._load_json_list(path)
-
-            self.status_var.set("正在统计...")
-            self.update_idletasks()
-
-            counter = Counter()
-            missing_or_empty_count = 0
-
-            for item in data_list:
-                if not isinstance(item, dict):
-                    missing_or_empty_count += 1
-                    continue
-
-                if field not in item:
-                    missing_or_empty_count += 1
-                    continue
-
-                value = item[field]
-
-                # 去除前后空格（仅对字符串）
-                if isinstance(value, str):
-                    value = value.strip()
+            approx_top = self.top_k_var.get() if self.approx_var.get() else None
+            if approx_top is not None and approx_top <= 0:
+                raise ValueError("Top 数量必须大于 0")
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("错误", f"Top 数量无效：{e}")
+            return
 
-                # 空值归入 other
-                if value is None or (isinstance(value, str) and value == ""):
-                    missing_or_empty_count += 1
-                else:
-                    counter[value] += 1
+        started = self.runner.start(
+            self._count_job,
+            path,
+            fields,
+            approx_top,
+            on_done=self._on_count_done,
+            on_error=self._on_job_error,
+            on_progress=self._show_progress,
+            on_cancel=self._on_job_cancelled,
+        )
+        if not started:
+            messagebox.showinfo("提示", "正在统计中，请稍候或先取消当前任务")
+            return
 
-            # 添加 other
-            if missing_or_empty_count > 0:
-                counter["other"] += missing_or_empty_count
+        self.status_var.set("正在统计...")
+        self.progress.config(value=0)
+
+    def _count_job(self, job, path, fields, approx_top):
+        """后台线程：统计并生成报告文本和表格数据（不能操作界面控件）。"""
+        engine = self._count(job, path, fields, approx_top)
+        job.progress(0, None, "正在生成报告...", force=True)
+        return engine, self._build_report(path, engine), self._build_sections(engine)
+
+    def _on_count_done(self, result):
+        engine, self.count_result, self.sections = result
+
+        titles = [title for title, _, _ in self.sections]
+        self.combo_section.config(values=titles)
+        self.section_var.set(titles[0] if titles else "")
+        self._show_section()
+
+        self.summary_var.set(f"总记录数：{engine.total}")
+        self.progress.config(value=self.progress.cget("maximum"))
+        self.status_var.set("统计完成（交叉表等完整报告可通过“保存结果到文件”导出）")
+
+    def _build_sections(self, engine):
+        """生成结果表格数据：每个字段一部分，多字段时再加组合统计。"""
+        if engine.approx_top:
+            columns = [
+                ("值", 400, "w", _value_sort_key, _format_value),
+                ("数量", 120, "e", int, str),
+                ("误差", 100, "e", int, str),
+            ]
+            rows_of = lambda sketch: sketch.top(engine.approx_top)
+            title_of = lambda name, sketch: f"{name}（约 {sketch.distinct_count()} 个不同值）"
+        else:
+            columns = [
+                ("值", 400, "w", _value_sort_key, _format_value),
+                ("数量", 120, "e", int, str),
+            ]
+            rows_of = lambda counter: list(counter.items())
+            title_of = lambda name, counter: f"{name}（{len(counter)} 个不同值）"
+
+        sections = []
+        for field, counter in zip(engine.fields, engine.marginals):
+            sections.append((title_of(field, counter), columns, rows_of(counter)))
+        if len(engine.fields) > 1:
+            name = f"组合：{' | '.join(engine.fields)}"
+            sections.append((title_of(name, engine.combined), columns, rows_of(engine.combined)))
+
+        # 默认按值 a-z 排序，other 放最后
+        for _, _, rows in sections:
+            rows.sort(key=lambda row: _value_sort_key(row[0]))
+        return sections
+
+    def _show_section(self):
+        title = self.section_var.get()
+        for section_title, columns, rows in self.sections:
+            if section_title == title:
+                self.table.set_data(columns, rows)
+                return
+
+    def _on_job_error(self, error):
+        messagebox.showerror("错误", str(error))
+        self.status_var.set("错误")
+
+    def _on_job_cancelled(self):
+        self.progress.config(value=0)
+        self.status_var.set("已取消")
+
+    def _count(self, job, path, fields, approx_top):
+        """统计字段，优先使用缓存的统计结果或已解析的元素。"""
+        if not os.path.exists(path):
+            raise ValueError("文件不存在")
 
-            # 生成报告文本
-            lines = []
-            lines.append(f"文件：{os.path.basename(path)}")
-            lines.append(f"统计字段：{field}")
-            lines.append(f"总记录数：{len(data_list)}")
+        # 每个文件只缓存最近一次的统计结果（高基数字段的计数器可能很大）
+        params = (tuple(fields), approx_top)
+        cached = self.cache.get(path, "count")
+        if cached is not None and cached[0] == params:
+            return cached[1]
+
+        items = self.cache.get(path, "items")
+        size = os.path.getsize(path)
+        if is_colfile(path):
+            engine = count_colfile(path, fields, approx_top, progress=job.progress)
+        elif items is not None:
+            engine = FieldCounter(fields, approx_top)
+            for i, item in enumerate(items):
+                if i % 10000 == 0:
+                    job.progress(i, len(items), f"正在统计（已缓存的数据）... {i}/{len(items)}")
+                engine.add(item)
+        elif is_json_lines(path) and size >= PARALLEL_MIN_SIZE:
+            engine = count_json_lines_parallel(path, fields, approx_top, progress=job.progress)
+        else:
+            engine = FieldCounter(fields, approx_top)
+            keep = [] if size <= ITEMS_CACHE_MAX_SIZE else None
+            for item in self._iter_json_items(path, progress=job.progress):
+                engine.add(item)
+                if keep is not None:
+                    keep.append(item)
+            if keep is not None:
+                self.cache.set(path, "items", keep, exclusive=True)
+                self.cache.set(path, "first", keep[0] if keep else _EMPTY)
+
+        self.cache.set(path, "count", (params, engine))
+        return engine
+
+    def _build_report(self, path, engine):
+        """生成报告文本：单字段时与原格式一致，多字段时追加组合统计与交叉表。"""
+        fields = engine.fields
+        lines = []
+        lines.append(f"文件：{os.path.basename(path)}")
+        lines.append(f"统计字段：{', '.join(fields)}")
+        lines.append(f"总记录数：{engine.total}")
+
+        if engine.approx_top:
+            self._append_approx_report(lines, engine)
+            return "\n".join(lines)
+
+        # 各字段统计（排序：按 key 名 a-z 排序，other 始终放最后）
+        for field, marginal in zip(fields, engine.marginals):
             lines.append("")
+            if len(fields) > 1:
+                lines.append(f"[{field}]")
             lines.append("值\t:\t数量")
             lines.append("-" * 40)
-
-            # 排序：按 key 名 a-z 排序，other 始终放最后
-            items = sorted((k, v) for k, v in counter.items() if k != "other")
-            if "other" in counter:
-                items.append(("other", counter["other"]))
-
-            for value, cnt in items:
+            for value, cnt in engine.sorted_items(marginal):
                 lines.append(f"{value}\t:\t{cnt}")
 
-            result_text = "\n".join(lines)
-            self.count_result = result_text
-
-            self.text_result.delete("1.0", tk.END)
-            self.text_result.insert(tk.END, result_text)
-
-            self.status_var.set("统计完成")
+        if len(fields) > 1:
+            # 组合统计
+            lines.append("")
+            lines.append(f"[组合：{' | '.join(fields)}]")
+            lines.append("值\t:\t数量")
+            lines.append("-" * 40)
+            keys = sorted(engine.combined, key=lambda k: tuple((v == OTHER, str(v)) for v in k))
+            for key in keys:
+                lines.append(f"{' | '.join(str(v) for v in key)}\t:\t{engine.combined[key]}")
 
-        except Exception as e:
-            messagebox.showerror("错误", str(e))
-            self.status_var.set("错误")
+            # 前两个字段的交叉表，不同值很多时只显示数量最多的部分
+            rows, cols, table = engine.crosstab(0, 1, CROSSTAB_TOP)
+            lines.append("")
+            lines.append(f"[交叉表：{fields[0]} × {fields[1]}]")
+            if len(engine.marginals[0]) > CROSSTAB_TOP or len(engine.marginals[1]) > CROSSTAB_TOP:
+                lines.append(f"（行、列各只显示数量最多的 {CROSSTAB_TOP} 个值，其余的值合并到 {OTHER}）")
+            lines.append("\t".join([f"{fields[0]} \\ {fields[1]}"] + [str(c) for c in cols] + ["合计"]))
+            for r in rows:
+                cells = [table.get((r, c), 0) for c in cols]
+                lines.append("\t".join([str(r)] + [str(v) for v in cells] + [str(sum(cells))]))
+            col_totals = [sum(table.get((r, c), 0) for r in rows) for c in cols]
+            lines.append("\t".join(["合计"] + [str(v) for v in col_totals] + [str(engine.total)]))
+
+        return "\n".join(lines)
+
+    def _append_approx_report(self, lines, engine):
+        """近似模式报告：每个字段（及组合键）的不同值个数估计和 Top N。"""
+        sections = list(zip(engine.fields, engine.marginals))
+        if len(engine.fields) > 1:
+            sections.append((f"组合：{' | '.join(engine.fields)}", engine.combined))
+
+        for title, sketch in sections:
+            distinct = sketch.distinct_count()
+            error = sketch.distinct.relative_error()
+            top = sketch.top(engine.approx_top)
+            lines.append("")
+            lines.append(f"[{title}]")
+            lines.append(f"不同值个数：约 {distinct}（相对误差约 ±{error * 2:.1%}，95% 置信）")
+            lines.append(
+                f"Top {len(top)}（近似计数，真实值在 [计数-误差, 计数] 之间，"
+                f"误差上限 {sketch.top_k.error_bound()}）"
+            )
+            lines.append("值\t:\t数量\t:\t误差")
+            lines.append("-" * 40)
+            for value, cnt, err in top:
+                if isinstance(value, tuple):
+                    value = " | ".join(str(v) for v in value)
+                lines.append(f"{value}\t:\t{cnt}\t:\t{err}")
 
     def save_result(self):
         if not self.count_result.strip():
@@ -257,6 +861,8 @@ class JsonFieldCounterApp(tk.Tk):
 
 
 if __name__ == "__main__":
+    # pyinstaller 打包后使用进程池需要
+    multiprocessing.freeze_support()
     app = JsonFieldCounterApp()
     app.mainloop()
 
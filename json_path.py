@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""JSON 字段路径选择器
+
+支持的写法：
+- address.city        嵌套字段
+- tags[*]             数组中的所有元素
+- items[0].price      数组下标（支持负数）
+- ["a.b"] / ['a.b']   字段名本身包含点号等特殊字符
+- 可选的 $ 前缀，如 $.address.city
+
+路径只在 compile_path 时解析一次，得到的访问函数可以直接用于每条记录，
+不会重复解析路径字符串。
+"""
+
+import re
+
+_TOKEN_RE = re.compile(
+    r"""\.?(?P<key>[^.\[\]]+)"""
+    r"""|\[(?P<index>\*|-?\d+)\]"""
+    r"""|\[(?P<quote>["'])(?P<qkey>.*?)(?P=quote)\]"""
+)
+
+
+def parse_path(expr):
+    """把路径字符串解析为步骤列表：("key", 名称) / ("index", 下标) / ("all", None)。"""
+    text = expr.strip()
+    if text.startswith("$"):
+        text = text[1:]
+    if not text:
+        raise ValueError(f"字段路径格式错误：{expr}")
+
+    steps = []
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"字段路径格式错误：{expr}")
+        if m.group("key") is not None:
+            # 第一个字段前不能有点号以外的内容，中间字段必须以点号分隔
+            if pos > 0 and text[pos] != ".":
+                raise ValueError(f"字段路径格式错误：{expr}")
+            steps.append(("key", m.group("key").strip()))
+        elif m.group("index") is not None:
+            index = m.group("index")
+            steps.append(("all", None) if index == "*" else ("index", int(index)))
+        else:
+            steps.append(("key", m.group("qkey")))
+        pos = m.end()
+    return steps
+
+
+def compile_path(expr):
+    """把路径编译为访问函数 accessor(item) -> 值列表。
+
+    字段不存在时返回空列表；含 [*] 时可能返回多个值。
+    """
+    steps = parse_path(expr)
+
+    # 最常见的情况：单个顶层字段，直接取值
+    if len(steps) == 1 and steps[0][0] == "key":
+        key = steps[0][1]
+
+        def top_level(item):
+            if isinstance(item, dict) and key in item:
+                return [item[key]]
+            return []
+
+        return top_level
+
+    walker = _compile_steps(steps, 0)
+
+    def accessor(item):
+        out = []
+        walker(item, out)
+        return out
+
+    return accessor
+
+
+def _compile_steps(steps, i):
+    """从第 i 步开始编译为闭包 walker(value, out)，命中的值追加到 out。"""
+    if i == len(steps):
+        return lambda value, out: out.append(value)
+
+    kind, arg = steps[i]
+    nxt = _compile_steps(steps, i + 1)
+
+    if kind == "key":
+        def step_key(value, out):
+            if isinstance(value, dict) and arg in value:
+                nxt(value[arg], out)
+        return step_key
+
+    if kind == "index":
+        def step_index(value, out):
+            if isinstance(value, list) and -len(value) <= arg < len(value):
+                nxt(value[arg], out)
+        return step_index
+
+    def step_all(value, out):
+        if isinstance(value, list):
+            for v in value:
+                nxt(v, out)
+    return step_all
+
+
+def list_paths(obj, prefix="", max_depth=4):
+    """列出对象中可用的字段路径（用于界面提示），列表以 [*] 表示。"""
+    paths = []
+    if not isinstance(obj, dict) or max_depth <= 0:
+        return paths
+
+    for key, value in obj.items():
+        name = str(key)
+        if "." in name or "[" in name or "]" in name:
+            path = f'{prefix}["{name}"]'
+        else:
+            path = f"{prefix}.{name}" if prefix else name
+        paths.append(path)
+
+        if isinstance(value, dict):
+            paths.extend(list_paths(value, path, max_depth - 1))
+        elif isinstance(value, list) and value:
+            paths.append(f"{path}[*]")
+            if isinstance(value[0], dict):
+                paths.extend(list_paths(value[0], f"{path}[*]", max_depth - 1))
+    return paths
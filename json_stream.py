@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""JSON 流式读写工具
+
+逐个读取 JSON 数组中的元素，内存占用只与单个元素的大小有关，
+适合处理几个 GB 的导出文件。
+
+写入时同样逐条输出（JsonArrayWriter / JsonLinesWriter），不需要先把全部数据放入列表。
+"""
+
+import codecs
+import json
+import os
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1 << 20  # 每次读取 1 MB
+
+# 单个数组元素的最大长度（字符数）。超过后仍解析不出元素时按格式错误处理，
+# 否则格式错误的文件会一直读入缓冲区直到文件末尾
+MAX_ITEM_SIZE = 64 << 20
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_TAIL = "0123456789.eE+-"
+
+
+class _ChunkReader:
+    """按块读取文件并增量解码为字符串，同时记录已读取的字节数。"""
+
+    def __init__(self, f, chunk_size, progress=None, total=0):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.total = total
+        self.offset = 0
+        self.eof = False
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def read(self):
+        raw = self.f.read(self.chunk_size)
+        self.offset += len(raw)
+        if not raw:
+            self.eof = True
+            text = self._decoder.decode(b"", final=True)
+        else:
+            text = self._decoder.decode(raw)
+        if self.progress:
+            self.progress(self.offset, self.total)
+        return text
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE, progress=None, max_item_size=MAX_ITEM_SIZE):
+    """逐个产出 JSON 数组中的元素。
+
+    progress(offset, total) 在每读取一块数据后回调，offset 为已读取的字节数。
+    读取超过 max_item_size 个字符仍解析不出一个元素时抛出 ValueError。
+    """
+    total = os.path.getsize(path)
+    decoder = json.JSONDecoder()
+
+    with open(path, "rb") as f:
+        reader = _ChunkReader(f, chunk_size, progress, total)
+        buf = ""
+        pos = 0
+
+        def skip_ws():
+            nonlocal buf, pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf) or reader.eof:
+                    return
+                buf = reader.read()
+                pos = 0
+
+        skip_ws()
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError("JSON 根结构必须是数组 (list)")
+        pos += 1
+
+        skip_ws()
+        if pos < len(buf) and buf[pos] == "]":
+            return
+
+        while True:
+            # 解析一个元素；数据不完整时继续读取下一块
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    if reader.eof:
+                        raise ValueError(f"JSON 解析失败: {e}")
+                    if len(buf) - pos > max_item_size:
+                        raise ValueError(
+                            f"JSON 解析失败: 位置 {reader.offset} 之前超过 {max_item_size} 个字符"
+                            f"仍无法解析出一个元素（{e}）"
+                        )
+                else:
+                    # 数字在块末尾可能被截断（如 1.5e10 只读到 1.5），
+                    # 需要确认后面紧跟的不是数字的一部分
+                    if reader.eof or (end < len(buf) and buf[end] not in _NUMBER_TAIL):
+                        break
+                buf = buf[pos:] + reader.read()
+                pos = 0
+
+            yield item
+            pos = end
+
+            skip_ws()
+            if pos >= len(buf):
+                raise ValueError("JSON 解析失败: 数组没有正常结束")
+            ch = buf[pos]
+            pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"JSON 解析失败: 位置 {reader.offset} 附近缺少逗号")
+            skip_ws()
+
+            # 丢弃已经解析过的内容，保持缓冲区大小有界
+            if pos > chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+
+def read_first_item(path, default=None):
+    """只读取第一个元素（JSON 数组或 JSON Lines），不解析文件的其余部分。"""
+    if is_json_lines(path):
+        items = iter_json_lines(path, chunk_size=64 << 10)
+    else:
+        items = iter_json_array(path, chunk_size=64 << 10)
+    try:
+        return next(items, default)
+    finally:
+        items.close()
+
+
+class ParsedFileCache:
+    """按 (路径, 文件大小, 修改时间) 缓存文件的解析结果，超过容量时淘汰最久未使用的文件。
+
+    同一个文件可以缓存多项内容（如第一个元素、全部元素、统计结果），
+    文件被修改后旧的缓存自动失效。可以在后台线程中使用。
+    """
+
+    def __init__(self, max_files=8):
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path):
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    def get(self, path, name, default=None):
+        try:
+            key = self._key(path)
+        except OSError:
+            return default
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or name not in entry:
+                return default
+            self._entries.move_to_end(key)
+            return entry[name]
+
+    def set(self, path, name, value, exclusive=False):
+        """缓存 path 的一项内容；exclusive=True 时删除其他文件的同名内容（只保留一份，如全部元素）。"""
+        key = self._key(path)
+        with self._lock:
+            if exclusive:
+                for other, entry in self._entries.items():
+                    if other != key:
+                        entry.pop(name, None)
+            if key not in self._entries:
+                # 同一路径的旧版本已经失效
+                for old in [k for k in self._entries if k[0] == key[0]]:
+                    del self._entries[old]
+                self._entries[key] = {}
+            self._entries[key][name] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_files:
+                self._entries.popitem(last=False)
+
+
+# ----------------- JSON Lines -----------------
+
+def is_json_lines(path):
+    """根据扩展名或首个非空白字符判断是否为 JSON Lines（每行一个 JSON）文件。"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return True
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    head = head.lstrip(b"\xef\xbb\xbf").lstrip()
+    return head[:1] == b"{"
+
+
+def split_line_ranges(path, chunk_size):
+    """把文件切分为若干 (start, end) 字节区间，每个区间都在换行处结束。"""
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, "rb") as f:
+        while start < size:
+            end = start + chunk_size
+            if end >= size:
+                end = size
+            else:
+                # 跳到下一行开头，保证不会切断某一行
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def iter_json_lines(path, start=0, end=None, chunk_size=CHUNK_SIZE, progress=None):
+    """逐行解析 JSON Lines 文件中 [start, end) 区间的内容，空行会被跳过。
+
+    progress(offset, total) 在每读取一块数据后回调，offset 为文件中的绝对位置。
+    """
+    total = os.path.getsize(path)
+    if end is None:
+        end = total
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        rest = b""
+        while offset < end:
+            block = f.read(min(chunk_size, end - offset))
+            if not block:
+                break
+            if offset == 0 and block.startswith(b"\xef\xbb\xbf"):
+                rest = block[3:]
+            else:
+                rest += block
+            offset += len(block)
+
+            lines = rest.split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield _loads_line(line, offset)
+            if progress:
+                progress(offset, total)
+
+        rest = rest.strip()
+        if rest:
+            yield _loads_line(rest, offset)
+
+
+def _loads_line(line, offset):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"JSON 解析失败（位置 {offset} 附近）: {e}")
+
+
+# ----------------- 流式写入 -----------------
+
+class JsonArrayWriter:
+    """逐条写入 JSON 数组。
+
+    indent=2 时输出与 json.dump(data, f, indent=2) 相同；compact=True 时不缩进、
+    不加多余空格（使用 C 实现的编码器，速度快得多）。
+    """
+
+    def __init__(self, f, indent=2, compact=False, ensure_ascii=False, default=None):
+        self.f = f
+        self.count = 0
+        self.compact = compact
+        if compact:
+            self._encode = json.JSONEncoder(
+                ensure_ascii=ensure_ascii, separators=(",", ":"), default=default
+            ).encode
+        else:
+            self._encode = json.JSONEncoder(
+                ensure_ascii=ensure_ascii, indent=indent, default=default
+            ).encode
+            self._pad = " " * (indent or 0)
+
+    def write(self, item):
+        text = self._encode(item)
+        if self.compact:
+            self.f.write(("," if self.count else "[") + text)
+        else:
+            self.f.write((",\n" if self.count else "[\n") + self._pad + text.replace("\n", "\n" + self._pad))
+        self.count += 1
+
+    def close(self):
+        """写入结尾的 ]（不关闭文件）。"""
+        if not self.count:
+            self.f.write("[]")
+        elif self.compact:
+            self.f.write("]")
+        else:
+            self.f.write("\n]")
+
+
+class JsonLinesWriter:
+    """逐条写入 JSON Lines：每行一个 JSON 值。compact=True 时不加多余空格。"""
+
+    def __init__(self, f, compact=False, ensure_ascii=False, default=None):
+        self.f = f
+        self.count = 0
+        separators = (",", ":") if compact else (", ", ": ")
+        self._encode = json.JSONEncoder(
+            ensure_ascii=ensure_ascii, separators=separators, default=default
+        ).encode
+
+    def write(self, item):
+        self.f.write(self._encode(item) + "\n")
+        self.count += 1
+
+    def close(self):
+        pass
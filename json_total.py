@@ -1,15 +1,186 @@
 import json
+import math
+from array import array
+from bisect import bisect_right
+from itertools import islice
+import os
+import struct
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, filedialog, messagebox
+
+from colfile import ColumnFile, is_colfile
+from json_path import compile_path, list_paths
+from json_stream import is_json_lines, iter_json_array, iter_json_lines, read_first_item
+from tk_jobs import JobRunner
+
+# 结果中显示的百分位数
+PERCENTILES = (25, 50, 75, 90, 95, 99)
+
+# 读取 .col 文件时每多少行报告一次进度
+COLFILE_BLOCK_ROWS = 1 << 16
+
+# 计算百分位数时分块排序的块大小（块内排序会临时生成 Python float 对象）
+SORT_CHUNK = 1 << 20
+
+_DOUBLE = struct.Struct("<d")
+_INT64 = struct.Struct("<q")
+_LOW_BITS = (1 << 63) - 1
+
+
+def _float_key(x):
+    """float -> 整数，保持大小顺序（负数的 IEEE 754 位模式需要翻转）。"""
+    i = _INT64.unpack(_DOUBLE.pack(x))[0]
+    return i if i >= 0 else i ^ _LOW_BITS
+
+
+def _key_float(key):
+    """_float_key 的逆运算。"""
+    return _DOUBLE.unpack(_INT64.pack(key if key >= 0 else key ^ _LOW_BITS))[0]
+
+
+class NumericAggregator:
+    """数值字段的单次遍历统计。
+
+    - 总和：整数部分用 Python int 精确累加，浮点部分用 Kahan 补偿求和
+    - 均值、方差：Welford 算法，数值稳定
+    - 最小值、最大值
+    - 百分位数：数值保存在紧凑的 array('d') 中（每个 8 字节），结束时原地分块排序，
+      再按数值二分查找第 k 小的值，不需要生成整体排序的 float 列表
+
+    只统计 int/float（bool 不算数字），其他类型以及超出 float 范围的整数计入 skipped。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.skipped = 0
+        self.int_sum = 0
+        self._float_sum = 0.0
+        self._compensation = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.values = array("d")
+        # 已排序的块 [(start, end), ...]，添加新值后失效
+        self._chunks = None
+
+    def add(self, value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            self.skipped += 1
+            return
+        if isinstance(value, float) and not math.isfinite(value):
+            self.skipped += 1
+            return
+        try:
+            x = float(value)
+        except OverflowError:
+            # 超出 float 范围的整数（JSON 中的超大整数）
+            self.skipped += 1
+            return
+
+        # 总和
+        if isinstance(value, int):
+            self.int_sum += value
+        else:
+            y = value - self._compensation
+            t = self._float_sum + y
+            self._compensation = (t - self._float_sum) - y
+            self._float_sum = t
+
+        # 均值与方差（Welford）
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        self.values.append(x)
+        self._chunks = None
+
+    @property
+    def total(self):
+        if self._float_sum == 0.0 and self._compensation == 0.0:
+            return self.int_sum
+        return self.int_sum + self._float_sum
+
+    @property
+    def variance(self):
+        """样本方差（n-1）。"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def percentile(self, p):
+        """第 p 百分位数（0~100），相邻两个值之间线性插值。"""
+        if not self.count:
+            return None
+        if self._chunks is None:
+            self._sort_chunks()
+        n = len(self.values)
+        pos = (n - 1) * p / 100
+        lo = int(pos)
+        hi = min(lo + 1, n - 1)
+        a = self._select(lo)
+        b = a if hi == lo else self._select(hi)
+        return a + (b - a) * (pos - lo)
+
+    def _sort_chunks(self):
+        """原地分块排序（值的顺序与其他统计无关）。"""
+        values = self.values
+        self._chunks = []
+        for start in range(0, len(values), SORT_CHUNK):
+            end = min(start + SORT_CHUNK, len(values))
+            values[start:end] = array("d", sorted(values[start:end]))
+            self._chunks.append((start, end))
+
+    def _select(self, k):
+        """第 k 小的值（从 0 开始）：二分查找最小的 x，使 <= x 的值多于 k 个。"""
+        values = self.values
+        chunks = self._chunks
+        lo = _float_key(min(values[start] for start, _ in chunks))
+        hi = _float_key(max(values[end - 1] for _, end in chunks))
+        while lo < hi:
+            mid = (lo + hi) // 2
+            x = _key_float(mid)
+            if sum(bisect_right(values, x, start, end) - start for start, end in chunks) > k:
+                hi = mid
+            else:
+                lo = mid + 1
+        # -0.0 与 0.0 相等，统一返回 0.0
+        return _key_float(lo) or 0.0
+
+
+def _fmt(value, digits=10):
+    if isinstance(value, float):
+        return f"{value:.{digits}g}"
+    return str(value)
+
 
 class JSONAggregatorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("JSON 字段累加工具")
-        self.root.geometry("600x400")
+        self.root.geometry("600x620")
+        self.runner = JobRunner(root)
+
+        # 文件输入：大文件流式解析，不经过文本框
+        file_frame = tk.Frame(root)
+        file_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.open_file_btn = tk.Button(file_frame, text="打开 JSON/JSONL 文件", command=self.open_file)
+        self.open_file_btn.pack(side=tk.LEFT)
+
+        self.file_label = tk.Label(file_frame, text="未选择文件（也可以在下方粘贴）", fg="#444")
+        self.file_label.pack(side=tk.LEFT, padx=10)
 
         # 文本框输入 JSON
-        tk.Label(root, text="粘贴 JSON 数据:").pack(anchor='w', padx=10, pady=5)
+        tk.Label(root, text="粘贴 JSON 数据（适合小片段，大文件请用“打开文件”）:").pack(anchor='w', padx=10, pady=5)
         self.text = tk.Text(root, height=10, width=70, undo=True)  # undo=True 支持 Ctrl+Z
         self.text.pack(padx=10, pady=5)
 
@@ -19,9 +190,9 @@ class JSONAggregatorApp:
         # Ctrl+C、Ctrl+X、Ctrl+V 默认已经支持
 
         # 字段选择下拉框
-        tk.Label(root, text="选择字段进行累加:").pack(anchor='w', padx=10, pady=5)
+        tk.Label(root, text="选择字段进行累加（支持 address.city、items[*].price 等路径）:").pack(anchor='w', padx=10, pady=5)
         self.field_var = tk.StringVar()
-        self.field_dropdown = ttk.Combobox(root, textvariable=self.field_var, state="readonly")
+        self.field_dropdown = ttk.Combobox(root, textvariable=self.field_var, width=40)
         self.field_dropdown.pack(padx=10, pady=5)
 
         # 按钮
@@ -37,11 +208,22 @@ class JSONAggregatorApp:
         self.clear_btn = tk.Button(button_frame, text="清空", command=self.clear_content)
         self.clear_btn.grid(row=0, column=2, padx=5)
 
+        self.cancel_btn = tk.Button(button_frame, text="取消", command=self.runner.cancel)
+        self.cancel_btn.grid(row=0, column=3, padx=5)
+
+        # 进度（按已读取的字节数显示）
+        self.progress = ttk.Progressbar(root, mode="determinate", length=500)
+        self.progress.pack(padx=10, pady=5)
+
+        self.status_label = tk.Label(root, text="", fg="#444")
+        self.status_label.pack(padx=10)
+
         # 显示结果
-        self.result_label = tk.Label(root, text="结果: 0", font=("Arial", 14))
+        self.result_label = tk.Label(root, text="结果: 0", font=("Arial", 14), justify="left")
         self.result_label.pack(padx=10, pady=20)
 
         self.json_data = []
+        self.file_path = None
 
     def select_all(self, event=None):
         self.text.tag_add("sel", "1.0", "end")
@@ -62,13 +244,59 @@ class JSONAggregatorApp:
             return
 
         self.json_data = data
-        fields = list(data[0].keys())
+        self.file_path = None
+        self.file_label.config(text="使用粘贴的数据")
+        self.set_fields(data[0])
+
+    def set_fields(self, first):
+        self.set_field_list(list_paths(first))
+
+    def set_field_list(self, fields):
         self.field_dropdown['values'] = fields
         if fields:
             self.field_dropdown.current(0)
 
+    def open_file(self):
+        path = filedialog.askopenfilename(
+            title="选择 JSON 文件",
+            filetypes=[("JSON 文件", "*.json *.jsonl *.ndjson"), ("列式文件", "*.col"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+
+        if is_colfile(path):
+            # 列式文件（见 colfile.py）：表头中就有列名
+            try:
+                with ColumnFile(path) as cf:
+                    fields = cf.names
+            except (OSError, ValueError) as e:
+                messagebox.showerror("错误", f"文件读取失败：{e}")
+                return
+            self.use_file(path)
+            self.set_field_list(fields)
+            return
+
+        # 只读取第一个元素获取字段名，不解析整个文件
+        try:
+            first = read_first_item(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"文件读取失败：{e}")
+            return
+        if not isinstance(first, dict):
+            messagebox.showerror("错误", "JSON 数据格式错误！必须是列表（或每行一个对象），且每个元素为字典。")
+            return
+
+        self.use_file(path)
+        self.set_fields(first)
+
+    def use_file(self, path):
+        self.file_path = path
+        self.json_data = []
+        size = os.path.getsize(path)
+        self.file_label.config(text=f"{os.path.basename(path)}（{size / 1048576:.1f} MB）")
+
     def calculate_sum(self):
-        if not self.json_data:
+        if not self.json_data and not self.file_path:
             messagebox.showerror("错误", "请先加载字段")
             return
 
@@ -77,13 +305,97 @@ class JSONAggregatorApp:
             messagebox.showerror("错误", "请选择一个字段")
             return
 
-        total = 0
+        try:
+            accessor = compile_path(field)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+
+        if self.file_path:
+            started = self.runner.start(
+                self.aggregate_file,
+                self.file_path,
+                accessor,
+                field,
+                on_done=self.show_result,
+                on_error=self.on_job_error,
+                on_progress=self.show_progress,
+                on_cancel=lambda: self.set_status("已取消"),
+            )
+            if not started:
+                messagebox.showinfo("提示", "正在统计中，请稍候或先取消")
+                return
+            self.set_status("正在统计...")
+            return
+
+        agg = NumericAggregator()
         for item in self.json_data:
-            value = item.get(field, 0)
-            if isinstance(value, (int, float)):
-                total += value
+            for value in accessor(item):
+                agg.add(value)
+
+        self.show_result(agg)
+
+    def aggregate_file(self, job, path, accessor, field):
+        """后台线程：流式读取文件并统计，内存只与字段值的数量有关。"""
+        if is_colfile(path):
+            return self.aggregate_colfile(job, path, field)
+        if is_json_lines(path):
+            items = iter_json_lines(path, progress=job.progress)
+        else:
+            items = iter_json_array(path, progress=job.progress)
+
+        agg = NumericAggregator()
+        for item in items:
+            for value in accessor(item):
+                agg.add(value)
+        job.progress(0, None, "正在计算百分位数...", force=True)
+        agg.percentile(50)
+        return agg
+
+    def aggregate_colfile(self, job, path, field):
+        """后台线程：直接读取 .col 文件中的一列，不需要解析文本。"""
+        agg = NumericAggregator()
+        with ColumnFile(path) as cf:
+            column = cf.column(field)
+            values = iter(column)
+            for start in range(0, len(column), COLFILE_BLOCK_ROWS):
+                job.progress(start, len(column), f"正在统计... {start} / {len(column)} 行")
+                for value in islice(values, COLFILE_BLOCK_ROWS):
+                    agg.add(value)
+        job.progress(0, None, "正在计算百分位数...", force=True)
+        agg.percentile(50)
+        return agg
+
+    def show_result(self, agg):
+        self.set_status("统计完成" if self.file_path else "")
+        self.result_label.config(text=self.format_result(agg))
+
+    def show_progress(self, done, total, text):
+        if total:
+            self.progress.config(maximum=total, value=done)
+        self.status_label.config(
+            text=text or f"正在统计... {done / 1048576:.1f} / {total / 1048576:.1f} MB"
+        )
+
+    def on_job_error(self, error):
+        self.set_status("错误")
+        messagebox.showerror("错误", str(error))
+
+    def set_status(self, text):
+        self.progress.config(value=0)
+        self.status_label.config(text=text)
 
-        self.result_label.config(text=f"结果: {total}")
+    def format_result(self, agg):
+        lines = [f"结果: {_fmt(agg.total, 15)}"]
+        if agg.count:
+            lines.append(
+                f"数量: {agg.count}    均值: {_fmt(agg.mean)}    标准差: {_fmt(agg.stdev)}"
+            )
+            lines.append(f"最小值: {_fmt(agg.min)}    最大值: {_fmt(agg.max)}")
+            lines.append("    ".join(f"P{p}: {_fmt(agg.percentile(p))}" for p in PERCENTILES))
+        if agg.skipped:
+            lines.append(f"已跳过非数字值: {agg.skipped}")
+        return "\n".join(lines)
 
     def clear_content(self):
         self.text.delete("1.0", tk.END)
@@ -91,6 +403,9 @@ class JSONAggregatorApp:
         self.field_dropdown['values'] = []
         self.field_var.set("")
         self.json_data = []
+        self.file_path = None
+        self.file_label.config(text="未选择文件（也可以在下方粘贴）")
+        self.set_status("")
 
 if __name__ == "__main__":
     root = tk.Tk()
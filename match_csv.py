@@ -1,18 +1,45 @@
-import csv
+import multiprocessing
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
+import csv_join
+from csv_columnar import load_csv
+from csv_keys import NORMALIZERS, KeySpec, quote_column
+from fuzzy_index import NgramIndex
+from tk_jobs import JobRunner
+
+# 跨文件匹配的连接方式：界面显示名称 -> csv_join 中的类型
+JOIN_LABELS = {
+    "保留匹配的行（semi）": "semi",
+    "保留不匹配的行（anti）": "anti",
+    "内连接，拼接 B 的列（inner）": "inner",
+    "左外连接，保留全部行（left）": "left",
+}
+
+# 勾选的规范化规则按这个顺序应用
+NORMALIZER_ORDER = ("nfkc", "trim", "casefold", "zeros")
+
 
 class CsvFilterApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("CSV 字段匹配过滤工具")
-        self.geometry("620x360")
+        self.geometry("780x720")
 
         self.csv_path = None
         self.headers = []
-        self.rows = []
+        self.table = None
         self.filtered_rows = []
+        self.ref_path = None
+        self.streaming = tk.BooleanVar(value=False)
+        self.memory_mb = tk.IntVar(value=csv_join.MEMORY_BUDGET >> 20)
+        self.parallel = tk.BooleanVar(value=True)
+        self.fuzzy = tk.BooleanVar(value=False)
+        self.fuzzy_threshold = tk.DoubleVar(value=0.85)
+        self.fuzzy_matches = None
+        self.fuzzy_key = None
+        self.normalizers = {name: tk.BooleanVar(value=name == "trim") for name in NORMALIZER_ORDER}
+        self.runner = JobRunner(self)
 
         self.create_widgets()
 
@@ -30,11 +57,17 @@ class CsvFilterApp(tk.Tk):
         self.file_label = ttk.Label(file_frame, text="未选择文件")
         self.file_label.pack(side="left", padx=10)
 
+        ttk.Checkbutton(
+            file_frame,
+            text="流式模式（大文件，不加载到内存，结果直接写入文件）",
+            variable=self.streaming
+        ).pack(side="right")
+
         # --- 字段选择 ---
         field_frame = ttk.LabelFrame(self, text="字段匹配规则")
         field_frame.pack(fill="x", padx=10, pady=10)
 
-        ttk.Label(field_frame, text="匹配字段（单值）").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        ttk.Label(field_frame, text="匹配字段").grid(row=0, column=0, padx=5, pady=5, sticky="w")
         self.field_a = ttk.Combobox(field_frame, state="disabled")
         self.field_a.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
 
@@ -42,8 +75,76 @@ class CsvFilterApp(tk.Tk):
         self.field_b = ttk.Combobox(field_frame, state="disabled")
         self.field_b.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
 
+        ttk.Label(
+            field_frame,
+            text="多列组合键用逗号分隔，如 civil_id, dept_id；列名后可用 | 单独指定规则，如 dept_id|trim|zeros；"
+                 "列名中有逗号时用双引号括起来，如 \"dept, id\""
+        ).grid(row=2, column=0, columnspan=2, padx=5, sticky="w")
+
+        ttk.Label(field_frame, text="规范化").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        norm_frame = ttk.Frame(field_frame)
+        norm_frame.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        for name in NORMALIZER_ORDER:
+            ttk.Checkbutton(
+                norm_frame, text=NORMALIZERS[name][0], variable=self.normalizers[name]
+            ).pack(side="left", padx=(0, 10))
+
+        ttk.Label(field_frame, text="内存上限（MB）").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        budget_frame = ttk.Frame(field_frame)
+        budget_frame.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+        ttk.Spinbox(
+            budget_frame, from_=16, to=65536, increment=64, width=8, textvariable=self.memory_mb
+        ).pack(side="left")
+        ttk.Checkbutton(
+            budget_frame, text="多进程并行扫描大文件", variable=self.parallel
+        ).pack(side="left", padx=10)
+        ttk.Label(
+            field_frame, text="流式模式和跨文件匹配中，值集合超过上限时改用外部排序归并（输出按匹配值排序）"
+        ).grid(row=5, column=0, columnspan=2, padx=5, sticky="w")
+
+        ttk.Label(field_frame, text="模糊匹配").grid(row=6, column=0, padx=5, pady=5, sticky="w")
+        fuzzy_frame = ttk.Frame(field_frame)
+        fuzzy_frame.grid(row=6, column=1, padx=5, pady=5, sticky="w")
+        ttk.Checkbutton(
+            fuzzy_frame, text="允许近似值（拼写错误、数字写反等，仅限当前文件内存模式）", variable=self.fuzzy
+        ).pack(side="left")
+        ttk.Label(fuzzy_frame, text="相似度阈值").pack(side="left", padx=(10, 2))
+        ttk.Spinbox(
+            fuzzy_frame, from_=0.5, to=1.0, increment=0.05, width=6, textvariable=self.fuzzy_threshold
+        ).pack(side="left")
+
         field_frame.columnconfigure(1, weight=1)
 
+        # --- 跨文件匹配 ---
+        ref_frame = ttk.LabelFrame(self, text="跨文件匹配（可选）：用文件 B 的值匹配当前文件的“匹配字段”")
+        ref_frame.pack(fill="x", padx=10, pady=10)
+
+        ttk.Button(
+            ref_frame,
+            text="选择文件 B",
+            command=self.load_ref_csv
+        ).grid(row=0, column=0, padx=5, pady=5, sticky="w")
+
+        self.ref_label = ttk.Label(ref_frame, text="未选择（在当前文件内匹配）")
+        self.ref_label.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+
+        ttk.Button(
+            ref_frame,
+            text="清除",
+            command=self.clear_ref_csv
+        ).grid(row=0, column=2, padx=5, pady=5, sticky="e")
+
+        ttk.Label(ref_frame, text="文件 B 的字段").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.ref_field = ttk.Combobox(ref_frame, state="disabled")
+        self.ref_field.grid(row=1, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+
+        ttk.Label(ref_frame, text="连接方式").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.join_type = ttk.Combobox(ref_frame, values=list(JOIN_LABELS), state="disabled")
+        self.join_type.current(0)
+        self.join_type.grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+
+        ref_frame.columnconfigure(1, weight=1)
+
         # --- 操作按钮 ---
         action_frame = ttk.Frame(self)
         action_frame.pack(fill="x", padx=10, pady=15)
@@ -64,6 +165,22 @@ class CsvFilterApp(tk.Tk):
         )
         self.save_btn.pack(side="left", padx=10)
 
+        ttk.Button(
+            action_frame,
+            text="取消",
+            command=self.runner.cancel
+        ).pack(side="left")
+
+        # --- 进度 ---
+        progress_frame = ttk.Frame(self)
+        progress_frame.pack(fill="x", padx=10)
+
+        self.progress = ttk.Progressbar(progress_frame, mode="determinate")
+        self.progress.pack(fill="x")
+
+        self.status_label = ttk.Label(progress_frame, text="就绪")
+        self.status_label.pack(anchor="w", pady=5)
+
     def load_csv(self):
         path = filedialog.askopenfilename(
             filetypes=[("CSV Files", "*.csv")]
@@ -71,49 +188,314 @@ class CsvFilterApp(tk.Tk):
         if not path:
             return
 
+        self._start_job(
+            self._read_csv_job,
+            path,
+            self.streaming.get(),
+            on_done=self._on_csv_loaded,
+            on_error=lambda e: messagebox.showerror("读取失败", str(e))
+        )
+
+    def _read_csv_job(self, job, path, headers_only):
+        """后台线程：读取 CSV 全部行（流式模式只读取表头）。"""
+        if headers_only:
+            return path, csv_join.read_headers(path), None
+
+        # 按列存储，不为每一行创建 dict
+        table = load_csv(
+            path,
+            progress=lambda done, total: job.progress(
+                done, total, f"正在读取... {done / 1048576:.1f} / {total / 1048576:.1f} MB"
+            ),
+        )
+        return path, table.headers, table
+
+    def _on_csv_loaded(self, result):
+        path, self.headers, self.table = result
+        self.filtered_rows = []
+        self.fuzzy_matches = None
+        self.save_btn.config(state="disabled")
+        if self.table is not None:
+            self._set_status(f"已读取 {len(self.table)} 行")
+        else:
+            self._set_status("流式模式：已读取表头，过滤时逐行处理")
+
+        self.csv_path = path
+        self.file_label.config(text=path.split("/")[-1])
+
+        # 可以直接输入多个字段，所以不设为只读；下拉列表中的列名按需加引号
+        choices = [quote_column(h) for h in self.headers]
+        self.field_a.config(values=choices, state="normal")
+        self.field_b.config(values=choices, state="normal")
+        self.filter_btn.config(state="normal")
+
+    def load_ref_csv(self):
+        path = filedialog.askopenfilename(
+            filetypes=[("CSV Files", "*.csv")]
+        )
+        if not path:
+            return
+
         try:
-            with open(path, newline="", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                self.headers = reader.fieldnames
-                self.rows = list(reader)
+            headers = csv_join.read_headers(path)
         except Exception as e:
             messagebox.showerror("读取失败", str(e))
             return
 
-        self.csv_path = path
-        self.file_label.config(text=path.split("/")[-1])
+        self.ref_path = path
+        self.ref_label.config(text=path.split("/")[-1])
+        self.ref_field.config(values=[quote_column(h) for h in headers], state="normal")
+        self.ref_field.set("")
+        self.join_type.config(state="readonly")
 
-        self.field_a.config(values=self.headers, state="readonly")
-        self.field_b.config(values=self.headers, state="readonly")
-        self.filter_btn.config(state="normal")
+    def clear_ref_csv(self):
+        self.ref_path = None
+        self.ref_label.config(text="未选择（在当前文件内匹配）")
+        self.ref_field.set("")
+        self.ref_field.config(values=[], state="disabled")
+        self.join_type.config(state="disabled")
+
+    def _key_specs(self, text_a, text_b):
+        """把两个字段输入框解析为 KeySpec；格式错误或列数不一致时提示并返回 None。"""
+        chain = tuple(name for name in NORMALIZER_ORDER if self.normalizers[name].get())
+        try:
+            spec_a = KeySpec.parse(text_a, chain)
+            spec_b = KeySpec.parse(text_b, chain)
+        except ValueError as e:
+            messagebox.showwarning("提示", str(e))
+            return None
+        if len(spec_a.columns) != len(spec_b.columns):
+            messagebox.showwarning("提示", "两边组合键的字段数量必须相同")
+            return None
+        return spec_a, spec_b
 
     def filter_rows(self):
-        field_a = self.field_a.get()
-        field_b = self.field_b.get()
+        field_a = self.field_a.get().strip()
+        field_b = (self.ref_field if self.ref_path else self.field_b).get().strip()
 
         if not field_a or not field_b:
-            messagebox.showwarning("提示", "请先选择两个字段")
+            if self.ref_path:
+                messagebox.showwarning("提示", "请先选择当前文件的匹配字段和文件 B 的字段")
+            else:
+                messagebox.showwarning("提示", "请先选择两个字段")
+            return
+
+        specs = self._key_specs(field_a, field_b)
+        if specs is None:
             return
+        field_a, field_b = specs
 
-        # 构建目标字段的值集合
-        value_set = {
-            (row.get(field_b) or "").strip()
-            for row in self.rows
-            if row.get(field_b)
-        }
+        threshold = None
+        if self.fuzzy.get():
+            if self.ref_path or self.streaming.get():
+                messagebox.showwarning("提示", "模糊匹配只支持当前文件内匹配（非流式模式）")
+                return
+            try:
+                threshold = self.fuzzy_threshold.get()
+            except tk.TclError:
+                threshold = 0
+            if not 0 < threshold <= 1:
+                messagebox.showwarning("提示", "相似度阈值必须在 0~1 之间")
+                return
 
-        self.filtered_rows = [
-            row for row in self.rows
-            if (row.get(field_a) or "").strip() in value_set
-        ]
+        if self.ref_path:
+            self._join_files(field_a, field_b)
+            return
+
+        if self.streaming.get():
+            self._filter_streaming(field_a, field_b)
+            return
+        if self.table is None:
+            messagebox.showwarning("提示", "文件是在流式模式下选择的，请重新选择文件以加载到内存")
+            return
+
+        self.fuzzy_key = field_a
+        self._start_job(
+            self._filter_job,
+            self.table,
+            field_a,
+            field_b,
+            threshold,
+            on_done=self._on_filtered,
+            on_error=lambda e: messagebox.showerror("过滤失败", str(e))
+        )
+
+    def _filter_job(self, job, table, field_a, field_b, fuzzy_threshold=None):
+        """后台线程：按目标字段的值集合过滤，返回 (保留的行号, 模糊匹配结果)。
 
+        field_a、field_b 为 KeySpec，规范化后的键按列计算一次并缓存在 table 中。
+        """
+        job.progress(0, 2, "正在构建目标字段集合...", force=True)
+        value_set = table.key_column(field_b).distinct()
+        value_set.discard("")
+
+        if fuzzy_threshold is not None:
+            return self._fuzzy_filter(job, table, field_a, value_set, fuzzy_threshold)
+
+        job.progress(1, 2, "正在过滤...", force=True)
+        return table.key_column(field_a).select(value_set.__contains__), None
+
+    def _fuzzy_filter(self, job, table, field_a, value_set, threshold):
+        """模糊匹配：为目标字段建立三元组倒排索引，每个不同的匹配值只查询一次。
+
+        返回 (保留的行号, {匹配值: (最相似的目标值, 相似度)})。
+        """
+        job.progress(0, None, "正在建立三元组索引...", force=True)
+        index = NgramIndex(value_set)
+
+        column = table.key_column(field_a)
+        values = {value for value in column.scan_values() if value}
+        total = len(values)
+        matches = {}
+        for i, value in enumerate(values):
+            if i % 1000 == 0:
+                job.progress(i, total, f"正在模糊匹配... {i} / {total}")
+            match = index.best_match(value, threshold)
+            if match is not None:
+                matches[value] = match
+        return column.select(matches.__contains__), matches
+
+    def _filter_streaming(self, field_a, field_b):
+        """流式模式：先选择输出文件，然后两遍扫描，匹配的行直接写入。"""
+        out_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv")]
+        )
+        if not out_path:
+            return
+
+        budget = self._memory_budget()
+        if budget is None:
+            return
+
+        self._start_job(
+            self._filter_streaming_job,
+            self.csv_path,
+            field_a,
+            field_b,
+            out_path,
+            budget,
+            self.parallel.get(),
+            on_done=self._on_streamed,
+            on_error=lambda e: messagebox.showerror("过滤失败", str(e))
+        )
+
+    def _filter_streaming_job(self, job, path, field_a, field_b, out_path, memory_budget, parallel):
+        """后台线程：第一遍只收集目标字段的值集合，第二遍逐行写入匹配的行。
+
+        值集合超过内存上限时 hash_join 自动改用外部排序归并。
+        """
+        stats = csv_join.hash_join(
+            path, field_a, path, field_b, out_path, "semi",
+            progress=job.progress, memory_budget=memory_budget, parallel=parallel
+        )
+        return stats, out_path
+
+    def _on_streamed(self, result):
+        stats, out_path = result
+        self._set_status("过滤完成")
+        note = "\n值集合超过内存上限，已改用外部排序归并（输出按匹配值排序）" if stats["build"] == "sort-merge" else ""
+        messagebox.showinfo(
+            "完成",
+            f"原始行数：{stats['total']}\n保留行数：{stats['kept']}{note}\n已保存到：{out_path}"
+        )
+
+    def _join_files(self, field_a, ref_field):
+        """跨文件匹配：较小的文件建哈希表，较大的文件流式扫描，结果直接写入文件。"""
+        out_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv")]
+        )
+        if not out_path:
+            return
+
+        budget = self._memory_budget()
+        if budget is None:
+            return
+
+        self._start_job(
+            self._join_job,
+            self.csv_path,
+            field_a,
+            self.ref_path,
+            ref_field,
+            JOIN_LABELS[self.join_type.get()],
+            out_path,
+            budget,
+            self.parallel.get(),
+            on_done=self._on_joined,
+            on_error=lambda e: messagebox.showerror("匹配失败", str(e))
+        )
+
+    def _join_job(self, job, path_a, key_a, path_b, key_b, how, out_path, memory_budget, parallel):
+        stats = csv_join.hash_join(
+            path_a, key_a, path_b, key_b, out_path, how,
+            progress=job.progress, memory_budget=memory_budget, parallel=parallel
+        )
+        return stats, out_path
+
+    def _on_joined(self, result):
+        stats, out_path = result
+        self._set_status("匹配完成")
+        if stats["build"] == "sort-merge":
+            strategy = "外部排序归并（超过内存上限，输出按匹配值排序）"
+        else:
+            strategy = "哈希表：" + ("当前文件" if stats["build"] == "A" else "文件 B") + "（较小的文件）"
+        messagebox.showinfo(
+            "完成",
+            f"原始行数：{stats['total']}\n输出行数：{stats['kept']}\n"
+            f"{strategy}\n已保存到：{out_path}"
+        )
+
+    def _memory_budget(self):
+        """读取内存上限（字节）；输入无效时提示并返回 None。"""
+        try:
+            mb = self.memory_mb.get()
+        except tk.TclError:
+            mb = 0
+        if mb <= 0:
+            messagebox.showwarning("提示", "内存上限必须是正整数（MB）")
+            return None
+        return mb << 20
+
+    def _on_filtered(self, result):
+        self.filtered_rows, self.fuzzy_matches = result
         self.save_btn.config(state="normal")
+        self._set_status("过滤完成")
 
+        note = ""
+        if self.fuzzy_matches is not None:
+            approx = sum(1 for _, score in self.fuzzy_matches.values() if score < 1.0)
+            note = f"\n其中近似匹配的不同值：{approx}（保存时附加“匹配值”和“相似度”两列）"
         messagebox.showinfo(
             "完成",
-            f"原始行数：{len(self.rows)}\n保留行数：{len(self.filtered_rows)}"
+            f"原始行数：{len(self.table)}\n保留行数：{len(self.filtered_rows)}{note}"
         )
 
+    # --- 后台任务 ---
+    def _start_job(self, func, *args, on_done, on_error):
+        started = self.runner.start(
+            func,
+            *args,
+            on_done=on_done,
+            on_error=lambda e: (self._set_status("错误"), on_error(e)),
+            on_progress=self._show_progress,
+            on_cancel=lambda: self._set_status("已取消")
+        )
+        if not started:
+            messagebox.showinfo("提示", "已有任务在运行，请稍候或先取消")
+            return
+        self._set_status("处理中...")
+
+    def _show_progress(self, done, total, text):
+        if total:
+            self.progress.config(maximum=total, value=done)
+        self.status_label.config(text=text or f"{done} 行")
+
+    def _set_status(self, text):
+        self.progress.config(value=0)
+        self.status_label.config(text=text)
+
     def save_csv(self):
         if not self.filtered_rows:
             return
@@ -126,10 +508,19 @@ class CsvFilterApp(tk.Tk):
             return
 
         try:
-            with open(path, "w", newline="", encoding="utf-8-sig") as f:
-                writer = csv.DictWriter(f, fieldnames=self.headers)
-                writer.writeheader()
-                writer.writerows(self.filtered_rows)
+            if self.fuzzy_matches is None:
+                self.table.write_csv(path, self.filtered_rows)
+            else:
+                keys = self.table.key_column(self.fuzzy_key)
+                matches = self.fuzzy_matches
+
+                def extra(i):
+                    value, score = matches[keys[i]]
+                    return [value, f"{score:.3f}"]
+
+                self.table.write_csv(
+                    path, self.filtered_rows, extra_headers=["匹配值", "相似度"], extra=extra
+                )
         except Exception as e:
             messagebox.showerror("保存失败", str(e))
             return
@@ -138,6 +529,8 @@ class CsvFilterApp(tk.Tk):
 
 
 if __name__ == "__main__":
+    # pyinstaller 打包后使用进程池需要
+    multiprocessing.freeze_support()
     app = CsvFilterApp()
     app.mainloop()
 
@@ -2,6 +2,12 @@ import json
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 
+# 批量模式下每条 UPDATE 默认包含的员工数
+DEFAULT_BATCH_SIZE = 500
+
+# user_profile 中会更新的字段（批量模式 VALUES 的列顺序）
+PROFILE_COLUMNS = ("title", "title_ar", "full_name", "full_name_ar", "phone_mobile", "email")
+
 # ------------------------
 # 工具函数
 # ------------------------
@@ -18,6 +24,10 @@ def sql_escape(value: str) -> str:
     """SQL 单引号转义"""
     return value.replace("'", "''")
 
+def sql_literal(value):
+    """None → NULL，其他值 → 转义后的字符串常量"""
+    return "NULL" if value is None else f"'{sql_escape(value)}'"
+
 def process_phone(phone):
     """
     规则：
@@ -44,19 +54,95 @@ def process_phone(phone):
 
     return p
 
+def profile_updates(item):
+    """
+    返回 (civil_id, {字段: 值})：
+    - 只包含需要更新的字段
+    - 没有 civil_id → (None, {})
+    """
+    civil_id = clean_value(item.get("Civil Number"))
+    if not civil_id:
+        return None, {}
+
+    email = clean_value(item.get("Email (@mafwr.gov.om)"))
+    values = {
+        "title": clean_value(item.get("Job Title (EN)")),
+        "title_ar": clean_value(item.get("Job Title (AR)")),
+        "full_name": clean_value(item.get("enFullName")),
+        "full_name_ar": clean_value(item.get("arFullName")),
+        "phone_mobile": process_phone(item.get("ContactNumber")),
+        "email": email.lower() if email else None,
+    }
+    return civil_id, {k: v for k, v in values.items() if v}
+
+def batched_profile_sql(profiles, batch_size):
+    """
+    每 batch_size 个员工生成一条 UPDATE ... FROM (VALUES ...)：
+    - profiles 为 {civil_id: {字段: 值}}
+    - 没有值的字段为 NULL，COALESCE 保留原值（与逐条模式只更新有值的字段一致）
+    - VALUES 第一行为 user_profile 各列类型的 NULL，其他行的字符串常量按这些类型解析
+      （否则都当作 text，civil_id 不是 text 类型时比较出错）；该行 civil_id 为 NULL，不匹配任何员工
+    """
+    items = list(profiles.items())
+    sets = ",\n    ".join(f"{c} = COALESCE(v.{c}, u.{c})" for c in PROFILE_COLUMNS)
+    types_row = "    (" + ", ".join(f"(NULL::user_profile).{c}" for c in ("civil_id",) + PROFILE_COLUMNS) + ")"
+    blocks = []
+
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        rows = ",\n".join(
+            "    (" + ", ".join(sql_literal(v) for v in [civil_id] + [updates.get(c) for c in PROFILE_COLUMNS]) + ")"
+            for civil_id, updates in chunk
+        )
+        blocks.append(
+            f"""-- user_profile | 批量更新第 {start + 1}-{start + len(chunk)} 个员工
+UPDATE user_profile AS u
+SET {sets}
+FROM (VALUES
+{types_row},
+{rows}
+) AS v(civil_id, {", ".join(PROFILE_COLUMNS)})
+WHERE u.civil_id = v.civil_id;
+"""
+        )
+
+    return blocks
+
+def read_batch_size():
+    """批量模式关闭 → None"""
+    if not batch_var.get():
+        return None
+    try:
+        size = int(batch_size_var.get())
+    except (tk.TclError, ValueError):
+        size = 0
+    if size <= 0:
+        raise ValueError("每批员工数必须是正整数")
+    return size
+
 # ------------------------
 # 主逻辑
 # ------------------------
+last_file = None
+
 def select_file():
+    global last_file
     path = filedialog.askopenfilename(
         title="选择 JSON 文件",
         filetypes=[("JSON files", "*.json")]
     )
     if path:
+        last_file = path
         generate_sql(path)
 
+def regenerate():
+    """切换批量模式后重新生成"""
+    if last_file:
+        generate_sql(last_file)
+
 def generate_sql(file_path):
     try:
+        batch_size = read_batch_size()
         with open(file_path, "r", encoding="utf-8") as f:
             data = json.load(f)
 
@@ -65,46 +151,29 @@ def generate_sql(file_path):
         # ------------------------
         # user_profile 更新
         # ------------------------
+        profiles = {}
         for item in data:
-            civil_id = clean_value(item.get("Civil Number"))
+            civil_id, updates = profile_updates(item)
             if not civil_id:
                 continue
 
-            updates = []
-
-            title = clean_value(item.get("Job Title (EN)"))
-            if title:
-                updates.append(f"title = '{sql_escape(title)}'")
-
-            title_ar = clean_value(item.get("Job Title (AR)"))
-            if title_ar:
-                updates.append(f"title_ar = '{sql_escape(title_ar)}'")
-
-            full_name = clean_value(item.get("enFullName"))
-            if full_name:
-                updates.append(f"full_name = '{sql_escape(full_name)}'")
-
-            full_name_ar = clean_value(item.get("arFullName"))
-            if full_name_ar:
-                updates.append(f"full_name_ar = '{sql_escape(full_name_ar)}'")
-
-            phone = process_phone(item.get("ContactNumber"))
-            if phone:
-                updates.append(f"phone_mobile = '{phone}'")
-
-            email = clean_value(item.get("Email (@mafwr.gov.om)"))
-            if email:
-                updates.append(f"email = '{sql_escape(email.lower())}'")
-
-            if updates:
+            if batch_size:
+                # 同一员工出现多次 → 合并，后面的值覆盖前面的（与逐条执行结果相同）
+                profiles.setdefault(civil_id, {}).update(updates)
+            elif updates:
+                sets = ", ".join(f"{k} = '{sql_escape(v)}'" for k, v in updates.items())
                 sql_blocks.append(
                     f"""-- user_profile | civil_id = {civil_id}
 UPDATE user_profile
-SET {", ".join(updates)}
+SET {sets}
 WHERE civil_id = '{civil_id}';
 """
                 )
 
+        if batch_size:
+            profiles = {k: v for k, v in profiles.items() if v}
+            sql_blocks.extend(batched_profile_sql(profiles, batch_size))
+
         # ------------------------
         # org_chart employees 更新（去重 & subject 来自 user_profile）
         # ------------------------
@@ -179,6 +248,17 @@ frame.pack(fill=tk.BOTH, expand=True)
 
 tk.Button(frame, text="选择 JSON 文件", command=select_file).pack(fill=tk.X, pady=5)
 
+# 批量模式：多个员工合并为一条 UPDATE，减少语句数量（远程执行时快很多）
+batch_frame = tk.Frame(frame)
+batch_frame.pack(fill=tk.X)
+batch_var = tk.BooleanVar(value=False)
+tk.Checkbutton(batch_frame, text="批量 UPDATE（UPDATE ... FROM VALUES）", variable=batch_var,
+               command=regenerate).pack(side=tk.LEFT)
+tk.Label(batch_frame, text="每批员工数:").pack(side=tk.LEFT, padx=(10, 0))
+batch_size_var = tk.StringVar(value=str(DEFAULT_BATCH_SIZE))
+tk.Spinbox(batch_frame, from_=1, to=100000, increment=100, width=8, textvariable=batch_size_var,
+           command=regenerate).pack(side=tk.LEFT)
+
 text_preview = scrolledtext.ScrolledText(frame, height=28)
 text_preview.pack(fill=tk.BOTH, expand=True, pady=5)
 
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""概率数据结构（固定内存的近似统计）
+
+- SpaceSaving：近似 Top-K 计数，计数误差不超过 总数 / 容量
+- HyperLogLog：近似不同值个数，相对标准误差约 1.04 / sqrt(2^p)
+- TopKSketch：两者组合，用于高基数字段（email、id 等）的统计
+- BloomFilter：近似集合成员判断，"不存在"的判断是精确的，"可能存在"有一定误判率
+
+哈希使用 blake2b 而不是内置 hash()，保证不同进程中结果一致，可以合并。
+"""
+
+import hashlib
+import heapq
+import math
+
+
+def stable_hash64(value):
+    """跨进程稳定的 64 位哈希。"""
+    data = repr(value).encode("utf-8", "surrogatepass")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class SpaceSaving:
+    """Space-Saving 算法：最多跟踪 capacity 个值。
+
+    每个值记录 (计数, 误差)，真实计数在 [计数 - 误差, 计数] 之间。
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.n = 0
+        # 最小堆 (计数, 序号, 值)，计数只增不减，堆中过期的条目在取最小值时修正。
+        # 每个条目的序号都不同，计数相同时不会比较到值（不同类型的值无法比较）
+        self._heap = []
+        self._seq = 0
+
+    def _entry(self, count, value):
+        self._seq += 1
+        return (count, self._seq, value)
+
+    def add(self, value, count=1):
+        self.n += count
+        counts = self.counts
+        if value in counts:
+            counts[value] += count
+            return
+
+        if len(counts) < self.capacity:
+            counts[value] = count
+            self.errors[value] = 0
+            heapq.heappush(self._heap, self._entry(count, value))
+            return
+
+        # 替换当前计数最小的值
+        heap = self._heap
+        while True:
+            c, _, old = heap[0]
+            current = counts[old]
+            if current == c:
+                break
+            heapq.heapreplace(heap, self._entry(current, old))
+
+        del counts[old]
+        del self.errors[old]
+        counts[value] = c + count
+        self.errors[value] = c
+        heapq.heapreplace(heap, self._entry(c + count, value))
+
+    def min_count(self):
+        """跟踪表已满时未被跟踪的值的计数上限，否则为 0。"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        """合并另一个 Space-Saving（可合并摘要：计数相加后保留前 capacity 个）。"""
+        m1 = self.min_count()
+        m2 = other.min_count()
+        merged = {}
+        for value in self.counts.keys() | other.counts.keys():
+            c1 = self.counts.get(value)
+            c2 = other.counts.get(value)
+            e1 = self.errors.get(value, m1) if c1 is not None else m1
+            e2 = other.errors.get(value, m2) if c2 is not None else m2
+            merged[value] = (
+                (c1 if c1 is not None else m1) + (c2 if c2 is not None else m2),
+                e1 + e2,
+            )
+
+        keep = heapq.nlargest(self.capacity, merged.items(), key=lambda kv: kv[1][0])
+        self.counts = {v: c for v, (c, _) in keep}
+        self.errors = {v: e for v, (_, e) in keep}
+        self.n += other.n
+        self._heap = [self._entry(c, v) for v, c in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k):
+        """返回计数最大的 k 个值：[(值, 计数, 误差), ...]。"""
+        items = heapq.nlargest(k, self.counts.items(), key=lambda kv: kv[1])
+        return [(v, c, self.errors[v]) for v, c in items]
+
+    def error_bound(self):
+        """任意值计数的最大误差。"""
+        return self.n // self.capacity if self.capacity else self.n
+
+
+class HyperLogLog:
+    """HyperLogLog 近似去重计数，p 为寄存器数量的对数（2^p 个寄存器）。"""
+
+    def __init__(self, p=14):
+        if not 4 <= p <= 18:
+            raise ValueError("HyperLogLog 的精度 p 必须在 4~18 之间")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self._shift = 64 - p
+        self._mask = (1 << self._shift) - 1
+
+    def add(self, value):
+        self.add_hash(stable_hash64(value))
+
+    def add_hash(self, h):
+        index = h >> self._shift
+        rank = self._shift - (h & self._mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("HyperLogLog 精度不同，无法合并")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # 小基数时使用线性计数修正
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def relative_error(self):
+        """相对标准误差。"""
+        return 1.04 / math.sqrt(self.m)
+
+
+class TopKSketch:
+    """固定内存的近似计数：Space-Saving Top-K + HyperLogLog 不同值个数。"""
+
+    def __init__(self, capacity=1000, p=14):
+        self.top_k = SpaceSaving(capacity)
+        self.distinct = HyperLogLog(p)
+
+    @property
+    def n(self):
+        return self.top_k.n
+
+    def add(self, value, count=1):
+        self.top_k.add(value, count)
+        self.distinct.add(value)
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        self.top_k.merge(other.top_k)
+        self.distinct.merge(other.distinct)
+
+    def top(self, k):
+        return self.top_k.top(k)
+
+    def distinct_count(self):
+        return self.distinct.count()
+
+
+class BloomFilter:
+    """布隆过滤器：capacity 个元素时误判率约为 error_rate。
+
+    每个元素约占 -ln(error_rate) / ln(2)^2 位（1% 时约 9.6 位），
+    远小于 set 中每个字符串的几十字节。
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        if not 0 < error_rate < 1:
+            raise ValueError("布隆过滤器的误判率必须在 0~1 之间")
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.m = max(int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)), 8)
+        self.k = max(int(round(self.m / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # 双重哈希：一次 128 位摘要拆成 h1、h2，第 i 个位置为 h1 + i * h2
+        if isinstance(value, str):
+            data = value.encode("utf-8", "surrogatepass")
+        else:
+            data = repr(value).encode("utf-8", "surrogatepass")
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def add(self, value):
+        bits = self.bits
+        for pos in self._positions(value):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value):
+        bits = self.bits
+        for pos in self._positions(value):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def merge(self, other):
+        """合并参数相同的另一个布隆过滤器（按位或）。"""
+        if (other.m, other.k) != (self.m, self.k):
+            raise ValueError("布隆过滤器参数不同，无法合并")
+        self.bits = bytearray(a | b for a, b in zip(self.bits, other.bits))
+        self.count += other.count
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def estimated_error_rate(self):
+        """按已加入的元素个数估算当前误判率。"""
+        return (1 - math.exp(-self.k * self.count / self.m)) ** self.k
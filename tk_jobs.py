@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tkinter 后台任务工具
+
+耗时任务在后台线程中运行，结果和进度通过队列传回，由主线程用 after() 轮询处理，
+界面在任务运行期间保持响应，并且可以随时取消。
+
+用法：
+    runner = JobRunner(root)
+    runner.start(func, arg1, arg2, on_done=..., on_progress=..., on_error=...)
+
+func 的第一个参数是 Job，用于报告进度和检查是否已取消：
+    def func(job, arg1, arg2):
+        for i, row in enumerate(rows):
+            if i % 10000 == 0:
+                job.progress(i, total)   # 自动节流，并在已取消时抛出 JobCancelled
+        return result
+
+注意：func 在后台线程中运行，不能直接操作任何 Tk 控件。
+"""
+
+import queue
+import threading
+import time
+
+
+class JobCancelled(Exception):
+    """任务被用户取消。"""
+
+
+class Job:
+    """后台任务句柄：报告进度、检查取消。"""
+
+    def __init__(self, result_queue, progress_interval):
+        self._queue = result_queue
+        self._cancel_event = threading.Event()
+        self._interval = progress_interval
+        self._last_progress = 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check(self):
+        """已取消时抛出 JobCancelled。"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress(self, done, total=None, text=None, force=False):
+        """报告进度：done / total（total 未知时传 None），text 为状态栏文字。
+
+        为避免刷屏，两次进度之间至少间隔 progress_interval 秒（force=True 时除外）。
+        """
+        self.check()
+        now = time.monotonic()
+        if not force and now - self._last_progress < self._interval:
+            return
+        self._last_progress = now
+        self._queue.put(("progress", (done, total, text)))
+
+
+class JobRunner:
+    """在后台线程中运行任务，同一时间只运行一个任务。"""
+
+    def __init__(self, widget, poll_ms=100, progress_interval=0.1):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self.progress_interval = progress_interval
+        self._queue = queue.Queue()
+        self._job = None
+        self._callbacks = {}
+
+    @property
+    def busy(self):
+        return self._job is not None
+
+    def start(self, func, *args, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        """启动任务；已有任务在运行时返回 False。"""
+        if self.busy:
+            return False
+
+        job = Job(self._queue, self.progress_interval)
+        self._job = job
+        self._callbacks = {
+            "done": on_done,
+            "error": on_error,
+            "progress": on_progress,
+            "cancelled": on_cancel,
+        }
+
+        def run():
+            try:
+                result = func(job, *args)
+            except JobCancelled:
+                self._queue.put(("cancelled", None))
+            except Exception as e:
+                if job.cancelled:
+                    self._queue.put(("cancelled", None))
+                else:
+                    self._queue.put(("error", e))
+            else:
+                self._queue.put(("done", result))
+
+        threading.Thread(target=run, daemon=True).start()
+        self.widget.after(self.poll_ms, self._poll)
+        return True
+
+    def cancel(self):
+        """请求取消当前任务（任务在下一次报告进度时停止）。"""
+        if self._job is not None:
+            self._job.cancel()
+
+    def _poll(self):
+        finished = None
+        latest_progress = None
+        try:
+            while True:
+                kind, payload = self._queue.get_nowait()
+                if kind == "progress":
+                    latest_progress = payload
+                else:
+                    finished = (kind, payload)
+                    break
+        except queue.Empty:
+            pass
+
+        callbacks = self._callbacks
+        if finished is None:
+            # 进度回调出错时也要继续轮询，否则任务结束后 busy 一直为 True
+            try:
+                if latest_progress is not None and callbacks["progress"]:
+                    callbacks["progress"](*latest_progress)
+            finally:
+                self.widget.after(self.poll_ms, self._poll)
+            return
+
+        # 任务结束：先清理状态，回调中可以立即启动下一个任务
+        self._job = None
+        self._callbacks = {}
+        kind, payload = finished
+        callback = callbacks[kind]
+        if callback is None:
+            return
+        if kind == "cancelled":
+            callback()
+        else:
+            callback(payload)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""列类型推断
+
+CSV 中的值都是字符串。这里根据前 SAMPLE_ROWS 行推断每一列的类型，
+为每一列生成一个转换函数，之后逐行转换（不需要第二遍扫描）：
+
+- null：样本中全部为空
+- bool：true / false（不区分大小写）
+- int：整数；有前导零（如 "00123"）或超过 15 位的视为字符串，避免丢失编号格式或精度
+- float：小数或科学计数法（包含整数的列也归为 float）
+- date：YYYY-MM-DD
+- datetime：YYYY-MM-DD HH:MM[:SS[.ffffff]]，可带时区
+- string：其他
+
+空单元格在非字符串列中转换为 None（JSON 中为 null）。
+样本之后如果出现不符合类型的值，保留原始字符串，不会中断转换。
+Excel 中已经是数字/日期的值保持原样，日期时间转换为 ISO 格式字符串。
+"""
+
+import datetime
+import re
+
+# 用于推断类型的行数
+SAMPLE_ROWS = 1000
+
+# 超过这个位数的整数保持字符串（JavaScript 等只能精确表示 2^53 以内的整数）
+MAX_INT_DIGITS = 15
+
+_INT = re.compile(r"[+-]?(0|[1-9]\d*)")
+_FLOAT = re.compile(r"[+-]?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?(Z|[+-]\d{2}:?\d{2})?")
+
+# 从窄到宽：一列中的值都能解析为某个类型时取该类型
+TYPES = ("null", "bool", "int", "float", "date", "datetime", "string")
+
+
+def _is_bool(text):
+    return text.lower() in ("true", "false")
+
+
+def _is_int(text):
+    return _INT.fullmatch(text) is not None and len(text.lstrip("+-")) <= MAX_INT_DIGITS
+
+
+def _is_float(text):
+    if _INT.fullmatch(text) is not None:
+        # 很长的数字串（身份证号、卡号等）转为 float 同样会丢失精度
+        return _is_int(text)
+    return _FLOAT.fullmatch(text) is not None
+
+
+def _is_date(text):
+    if _DATE.fullmatch(text) is None:
+        return False
+    try:
+        datetime.date.fromisoformat(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_datetime(text):
+    if _DATETIME.fullmatch(text) is None:
+        return False
+    try:
+        datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    return True
+
+
+_CHECKS = {
+    "bool": _is_bool,
+    "int": _is_int,
+    "float": _is_float,
+    "date": _is_date,
+    "datetime": _is_datetime,
+}
+
+
+def infer_type(values):
+    """推断一组值（一列的样本）的类型。"""
+    candidates = ["bool", "int", "float", "date", "datetime"]
+    seen = False
+    for value in values:
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            # Excel 中已经有类型的值
+            if isinstance(value, bool):
+                kind = "bool"
+            elif isinstance(value, int):
+                kind = "int"
+            elif isinstance(value, float):
+                kind = "float"
+            elif isinstance(value, datetime.datetime):
+                kind = "datetime"
+            elif isinstance(value, datetime.date):
+                kind = "date"
+            else:
+                return "string"
+            candidates = [c for c in candidates if c == kind or (c == "float" and kind == "int")]
+            seen = True
+        else:
+            text = value.strip()
+            if not text:
+                continue
+            seen = True
+            candidates = [c for c in candidates if _CHECKS[c](text)]
+        if not candidates:
+            return "string"
+    if not seen:
+        return "null"
+    return candidates[0]
+
+
+def _native(value):
+    """Excel 的日期时间转换为 ISO 字符串，其他值保持原样。"""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _parse_bool(text):
+    return text.lower() == "true" if _is_bool(text) else text
+
+
+def _parse_int(text):
+    return int(text) if _is_int(text) else text
+
+
+def _parse_float(text):
+    return float(text) if _is_float(text) else text
+
+
+def _parse_text(text):
+    # 日期保持 ISO 字符串（JSON 没有日期类型），只去除首尾空白
+    return text
+
+
+# 类型 -> 非空字符串的转换函数（不符合类型时返回原字符串）
+_PARSERS = {
+    "null": _parse_text,
+    "bool": _parse_bool,
+    "int": _parse_int,
+    "float": _parse_float,
+    "date": _parse_text,
+    "datetime": _parse_text,
+}
+
+
+def converter(kind):
+    """返回该类型的转换函数：原始值 -> JSON 可以表示的值。"""
+    if kind == "string":
+        return _native
+
+    parse = _PARSERS[kind]
+    to_float = kind == "float"
+
+    def convert(value):
+        if not isinstance(value, str):
+            if to_float and type(value) is int:
+                return float(value)
+            return _native(value)
+        text = value.strip()
+        if not text:
+            return None
+        return parse(text)
+
+    return convert
+
+
+def typed_rows(rows, width, sample=SAMPLE_ROWS):
+    """读取前 sample 行推断每一列的类型，返回 (类型列表, 转换后的行迭代器)。
+
+    样本行会先缓存下来，转换后和剩余的行一起产出，整个过程只读取一遍。
+    """
+    rows = iter(rows)
+    buffered = []
+    for row in rows:
+        buffered.append(row)
+        if len(buffered) >= sample:
+            break
+
+    types = [infer_type(row[i] for row in buffered if i < len(row)) for i in range(width)]
+    converters = [converter(kind) for kind in types]
+
+    def generate():
+        for row in buffered:
+            yield [convert(value) for convert, value in zip(converters, row)]
+        for row in rows:
+            yield [convert(value) for convert, value in zip(converters, row)]
+
+    return types, generate()